@@ -0,0 +1,237 @@
+import glob
+import gzip
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+def build_docs_tree(n_pages, section_name, fanout=8):
+    """
+    Builds a synthetic navigation tree shaped like the docs site's 'pageProps.tree'.
+
+    Pages are laid out breadth-first with up to `fanout` children per node, so large trees
+    are also deep. Construction is iterative, so any size can be generated.
+
+    Args:
+        n_pages (int): Number of navigation entries in the tree.
+        section_name (str): Section name used in the generated hrefs.
+        fanout (int, optional): Maximum children per node. Defaults to 8.
+
+    Returns:
+        dict: A tree with a top-level 'children' list.
+    """
+    root = {"children": [], "href": f"/en/{section_name}"}
+    frontier = [root]  # Nodes that can still take children, in breadth-first order
+    cursor = 0
+    for i in range(n_pages):
+        parent = frontier[cursor]
+        depth = parent.get("depth", 0) + 1
+        node = {
+            "id": f"{section_name}-{i}",
+            "href": f"/en/{section_name}/page-{i}",
+            "label": f"Page {i}",
+            "type": "page" if i % 5 else "section",
+            "depth": depth,
+            "parentRef": parent["href"],
+            "children": [],
+        }
+        parent["children"].append(node)
+        frontier.append(node)
+        if len(parent["children"]) >= fanout:
+            cursor += 1
+    return root
+
+class FakeSpider:
+    """
+    Local stand-in for the Spider client with configurable latency, failures and payload size.
+
+    Navigation requests (those asking for 'return_json_data') return a synthetic tree built by
+    build_docs_tree; text requests return one result per comma-separated URL. Every call's
+    latency is recorded in `timings` under 'nav' or 'text'. The client is thread-safe.
+
+    Args:
+        pages_per_section (int): Navigation entries returned for every section.
+        latency (float, optional): Base seconds per request. Defaults to 0.05.
+        per_url_latency (float, optional): Extra seconds per URL in a batch. Defaults to 0.0.
+        failure_rate (float, optional): Probability that a single URL fails. Defaults to 0.0.
+        batch_failure_rate (float, optional): Probability that a whole request raises. Defaults to 0.0.
+        payload_bytes (int, optional): Average size of a page's text content. Defaults to 4096.
+        seed (int, optional): Seed for the random generator. Defaults to 0.
+    """
+
+    def __init__(self, pages_per_section, latency=0.05, per_url_latency=0.0, failure_rate=0.0,
+                 batch_failure_rate=0.0, payload_bytes=4096, seed=0):
+        self.pages_per_section = pages_per_section
+        self.latency = latency
+        self.per_url_latency = per_url_latency
+        self.failure_rate = failure_rate
+        self.batch_failure_rate = batch_failure_rate
+        self.payload_bytes = payload_bytes
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)  # 'nav' / 'text' -> per-call seconds
+        self.bytes_served = 0
+
+    def _payload(self, url):
+        # Vary sizes by +/-50% around payload_bytes, built cheaply from a repeated pattern
+        with self.lock:
+            size = max(1, int(self.payload_bytes * self.random.uniform(0.5, 1.5)))
+        line = f"# {url}\nSnowflake documentation body text. "
+        return (line * (size // len(line) + 1))[:size]
+
+    def scrape_url(self, url, params=None):
+        """
+        Simulates a Spider request for one URL or a comma-separated batch of URLs.
+        """
+        params = params or {}
+        started = time.perf_counter()
+        if params.get('return_json_data'):
+            time.sleep(self.latency)
+            section_name = url.rstrip('/').split('/')[-1]
+            tree = build_docs_tree(self.pages_per_section, section_name)
+            self.timings['nav'].append(time.perf_counter() - started)
+            return [{"url": url, "status": 200, "json_data": {"other_scripts": [{"props": {"pageProps": {"tree": tree}}}]}}]
+        urls = url.split(',')
+        time.sleep(self.latency + self.per_url_latency * len(urls))
+        with self.lock:
+            batch_fails = self.random.random() < self.batch_failure_rate
+            url_fails = [self.random.random() < self.failure_rate for _ in urls]
+        if batch_fails:
+            self.timings['text'].append(time.perf_counter() - started)
+            raise RuntimeError("Simulated Spider batch failure")
+        results = []
+        served = 0
+        for u, fails in zip(urls, url_fails):
+            if fails:
+                results.append({"url": u, "status": 500, "content": None, "error": "Simulated failure"})
+            else:
+                content = self._payload(u)
+                served += len(content)
+                results.append({"url": u, "status": 200, "content": content, "error": None})
+        with self.lock:
+            self.bytes_served += served
+        self.timings['text'].append(time.perf_counter() - started)
+        return results
+
+class FakeRow(dict):
+    """
+    Minimal stand-in for a Snowpark Row: supports item access and as_dict().
+    """
+
+    def as_dict(self):
+        return dict(self)
+
+class _FakeQuery:
+    """
+    Result of FakeSession.sql(); statements run when collected.
+    """
+
+    def __init__(self, session, query, params):
+        self.session = session
+        self.query = query
+        self.params = params
+
+    def collect(self):
+        return self.session._execute(self.query, self.params)
+
+    def collect_nowait(self):
+        rows = self.collect()
+        return _FakeAsyncJob(rows)
+
+class _FakeQueryHistory:
+    """
+    Stand-in for a Snowpark QueryHistory context manager; FakeSession records no query IDs.
+    """
+
+    queries = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+class _FakeAsyncJob:
+    """
+    Already-finished stand-in for a Snowpark AsyncJob.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.query_id = "fake-query"
+
+    def result(self):
+        return self.rows
+
+    def is_done(self):
+        return True
+
+class _FakeFileOperation:
+    """
+    Stand-in for Session.file supporting PUT.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def put(self, local_file_name, stage_location, **kwargs):
+        """
+        Reads the local gzip NDJSON files matched by local_file_name and counts their rows.
+        """
+        started = time.perf_counter()
+        pattern = local_file_name[len("file://"):] if local_file_name.startswith("file://") else local_file_name
+        rows = 0
+        for path in glob.glob(pattern):
+            with gzip.open(path, "rb") as f:
+                rows += sum(1 for _ in f)
+            self.session.bytes_uploaded += os.path.getsize(path)
+        time.sleep(self.session.upload_latency)
+        self.session.staged_rows[stage_location.lstrip('@').rstrip('/')] += rows
+        self.session.timings['put'].append(time.perf_counter() - started)
+        return []
+
+class FakeSession:
+    """
+    Local stand-in for a Snowpark Session that accepts the statements issued by the loaders.
+
+    PUT reads the staged files to count rows and bytes, COPY INTO reports those rows as
+    loaded, and every other statement succeeds with no rows. Per-statement latency is
+    recorded in `timings` under 'put', 'copy' and 'sql'.
+
+    Args:
+        upload_latency (float, optional): Seconds added to every PUT and COPY. Defaults to 0.0.
+    """
+
+    def __init__(self, upload_latency=0.0):
+        self.upload_latency = upload_latency
+        self.file = _FakeFileOperation(self)
+        self.staged_rows = defaultdict(int)  # Stage path -> rows PUT there
+        self.rows_loaded = defaultdict(int)  # Table -> rows loaded by COPY INTO
+        self.bytes_uploaded = 0
+        self.timings = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def sql(self, query, params=None):
+        return _FakeQuery(self, query, params)
+
+    def query_history(self, include_describe=False, include_thread_id=False, include_error=False):
+        return _FakeQueryHistory()
+
+    def _execute(self, query, params):
+        started = time.perf_counter()
+        text = " ".join(query.split())
+        if text.startswith("COPY INTO"):
+            table = text.split()[2]
+            stage = text.split(" FROM @")[1].split()[0].rstrip(')').rstrip('/')
+            time.sleep(self.upload_latency)
+            with self.lock:
+                loaded = self.staged_rows.pop(stage, 0)
+                self.rows_loaded[table] += loaded
+            self.timings['copy'].append(time.perf_counter() - started)
+            return [FakeRow(file=stage, status="LOADED", rows_loaded=loaded)]
+        self.timings['sql'].append(time.perf_counter() - started)
+        return []
+
+    def close(self):
+        pass
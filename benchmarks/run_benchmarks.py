@@ -0,0 +1,246 @@
+"""
+Offline throughput benchmarks for the scraping and loading stages.
+
+Every scenario runs against FakeSpider and FakeSession in its own subprocess, so peak RSS is
+measured per scenario. Results are written as JSON and can be compared with an earlier run:
+
+    python -m benchmarks.run_benchmarks --pages 1000 10000 100000
+    python -m benchmarks.run_benchmarks --compare bench_results/previous.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks.fakes import FakeSession, FakeSpider, build_docs_tree
+
+# Sections processed by the pipeline scenario; the synthetic pages are split evenly between them
+SECTION_NAMES = ["guides", "developer", "reference", "releases"]
+SCENARIOS = ["extract_tree_data", "scrape_section", "scrape_text_content", "upload_text_data", "pipeline"]
+
+def percentiles(samples):
+    """
+    Summarises latency samples as p50/p90/p99/max in milliseconds.
+
+    Args:
+        samples (list): Durations in seconds.
+
+    Returns:
+        dict: Percentile values, or an empty dict when there are no samples.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process in MiB, or None if unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def make_client(options, pages_per_section):
+    """
+    Builds a FakeSpider from the command line options.
+    """
+    return FakeSpider(
+        pages_per_section,
+        latency=options["latency"],
+        per_url_latency=options["per_url_latency"],
+        failure_rate=options["failure_rate"],
+        batch_failure_rate=options["batch_failure_rate"],
+        payload_bytes=options["payload_bytes"],
+        seed=options["seed"],
+    )
+
+def run_scenario(scenario, n_pages, options):
+    """
+    Runs one scenario for a synthetic docs tree of n_pages and returns its measurements.
+
+    Args:
+        scenario (str): One of SCENARIOS.
+        n_pages (int): Total number of pages in the synthetic docs tree.
+        options (dict): Fake service settings from the command line.
+
+    Returns:
+        dict: Pages processed, elapsed seconds, pages/sec, peak RSS and per-stage latency percentiles.
+    """
+    # Imported here so each subprocess pays its own import cost outside the timed region
+    from core.scraper import extract_tree_data, scrape_section, scrape_text_content
+    from core.snowflake_utils import TextUploadSink
+    from core.pipeline import run_pipeline
+
+    stages = {}
+    if scenario == "extract_tree_data":
+        tree = build_docs_tree(n_pages, "reference")
+        started = time.perf_counter()
+        pages = len(extract_tree_data(tree))
+        elapsed = time.perf_counter() - started
+    elif scenario == "scrape_section":
+        client = make_client(options, n_pages)
+        started = time.perf_counter()
+        pages = len(scrape_section(client, "https://docs.snowflake.com/en/reference", "reference"))
+        elapsed = time.perf_counter() - started
+        stages["spider_nav"] = percentiles(client.timings["nav"])
+    elif scenario == "scrape_text_content":
+        client = make_client(options, n_pages)
+        urls = [f"https://docs.snowflake.com/en/reference/page-{i}" for i in range(n_pages)]
+        started = time.perf_counter()
+        failures = []
+        pages = len(scrape_text_content(
+            client, urls, {}, batch_size=options["batch_size"], concurrency=options["concurrency"],
+            failures=failures
+        ))
+        elapsed = time.perf_counter() - started
+        stages["spider_text_batch"] = percentiles(client.timings["text"])
+    elif scenario == "upload_text_data":
+        session = FakeSession(upload_latency=options["upload_latency"])
+        client = make_client(options, n_pages)
+        sink = TextUploadSink(session, "reference")
+        started = time.perf_counter()
+        # Generate rows lazily so only the sink's buffer is held in memory
+        for i in range(n_pages):
+            url = f"https://docs.snowflake.com/en/reference/page-{i}"
+            sink.add([{"url": url, "content": client._payload(url)}])
+        sink.close()
+        elapsed = time.perf_counter() - started
+        pages = session.rows_loaded["ONLINE_RESOURCES_TXT"]
+        stages.update({f"snowflake_{k}": percentiles(v) for k, v in session.timings.items()})
+    elif scenario == "pipeline":
+        per_section = max(1, n_pages // len(SECTION_NAMES))
+        client = make_client(options, per_section)
+        session = FakeSession(upload_latency=options["upload_latency"])
+        sections = [{"url": f"https://docs.snowflake.com/en/{name}", "basename": name} for name in SECTION_NAMES]
+        started = time.perf_counter()
+        run_pipeline(session, client, sections)
+        elapsed = time.perf_counter() - started
+        pages = session.rows_loaded["ONLINE_RESOURCES_TXT"]
+        stages["spider_nav"] = percentiles(client.timings["nav"])
+        stages["spider_text_batch"] = percentiles(client.timings["text"])
+        stages.update({f"snowflake_{k}": percentiles(v) for k, v in session.timings.items()})
+    else:
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    return {
+        "scenario": scenario,
+        "pages": n_pages,
+        "pages_processed": pages,
+        "elapsed_s": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+def _scenario_worker(scenario, n_pages, options, results):
+    # Keep per-batch pipeline logging out of the benchmark output
+    logging.getLogger("core.config").setLevel(logging.WARNING)
+    results.put(run_scenario(scenario, n_pages, options))
+
+def run_isolated(scenario, n_pages, options):
+    """
+    Runs a scenario in a fresh process so its peak RSS is not polluted by earlier scenarios.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_scenario_worker, args=(scenario, n_pages, options, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def git_revision():
+    """
+    Returns the current git commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, previous):
+    """
+    Prints the pages/sec change of every scenario present in both reports.
+    """
+    before = {(r["scenario"], r["pages"]): r for r in previous["results"]}
+    print(f"\nComparison against {previous.get('revision')} ({previous.get('timestamp')}):")
+    for result in current["results"]:
+        old = before.get((result["scenario"], result["pages"]))
+        if not old or not old.get("pages_per_sec") or not result.get("pages_per_sec"):
+            continue
+        ratio = result["pages_per_sec"] / old["pages_per_sec"]
+        print(f"  {result['scenario']:<22} {result['pages']:>7} pages: "
+              f"{old['pages_per_sec']:>10.1f} -> {result['pages_per_sec']:>10.1f} pages/s ({ratio:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline scraping/loading benchmarks.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Synthetic docs tree sizes to benchmark.")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Spider seconds per request.")
+    parser.add_argument("--per-url-latency", type=float, default=0.0, help="Fake Spider seconds per URL in a batch.")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="Probability that a single URL fails.")
+    parser.add_argument("--batch-failure-rate", type=float, default=0.0, help="Probability that a batch request raises.")
+    parser.add_argument("--payload-bytes", type=int, default=4096, help="Average page content size.")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="Fake Snowflake seconds per PUT/COPY.")
+    parser.add_argument("--batch-size", type=int, default=500, help="URLs per Spider batch.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Spider batches in flight.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Where to write the JSON report. Defaults to bench_results/<timestamp>.json.")
+    parser.add_argument("--compare", help="Earlier JSON report to compare pages/sec against.")
+    args = parser.parse_args()
+
+    options = {
+        "latency": args.latency,
+        "per_url_latency": args.per_url_latency,
+        "failure_rate": args.failure_rate,
+        "batch_failure_rate": args.batch_failure_rate,
+        "payload_bytes": args.payload_bytes,
+        "upload_latency": args.upload_latency,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": [],
+    }
+    for n_pages in args.pages:
+        for scenario in args.scenarios:
+            result = run_isolated(scenario, n_pages, options)
+            report["results"].append(result)
+            print(f"{scenario:<22} {n_pages:>7} pages: {result['pages_per_sec'] or 0:>10.1f} pages/s, "
+                  f"{result['elapsed_s']:>8.3f}s, peak RSS {result['peak_rss_mb']} MiB")
+
+    output = args.output or os.path.join("bench_results", f"{report['timestamp'].replace(':', '')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import gzip
+import json
+import os
+import tempfile
+import uuid
+from .config import logger, BULK_FILE_MAX_BYTES, BULK_PUT_PARALLEL
+from .metrics import metrics, run_query
+
+# Temporary internal stage used for all bulk loads made through a session
+BULK_STAGE = "SCRAPE_BULK_STAGE"
+
+def write_ndjson_files(rows, directory, prefix, max_file_bytes=BULK_FILE_MAX_BYTES):
+    """
+    Writes rows to gzip-compressed NDJSON files, rolling over to a new file by size.
+
+    Each row is serialised as one JSON document per line. Once the uncompressed bytes written
+    to the current file reach max_file_bytes a new file is started, so large sections are split
+    into several files that Snowflake can PUT and COPY in parallel.
+
+    Args:
+        rows (iterable): Dictionaries to write, one per line.
+        directory (str): Local directory in which the files are created.
+        prefix (str): File name prefix; files are named '<prefix>_<n>.json.gz'.
+        max_file_bytes (int, optional): Uncompressed size at which a new file is started.
+            Defaults to BULK_FILE_MAX_BYTES.
+
+    Returns:
+        list: The paths of the files written, in order.
+    """
+    paths = []
+    current = None  # Open gzip file handle for the file being written
+    current_bytes = 0
+    try:
+        for row in rows:
+            line = (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            # Roll over to a new file when the current one is full (always keep at least one row)
+            if current is None or (current_bytes and current_bytes + len(line) > max_file_bytes):
+                if current is not None:
+                    current.close()
+                path = os.path.join(directory, f"{prefix}_{len(paths)}.json.gz")
+                paths.append(path)
+                current = gzip.open(path, "wb", compresslevel=6)
+                current_bytes = 0
+            current.write(line)
+            current_bytes += len(line)
+    finally:
+        if current is not None:
+            current.close()
+    return paths
+
+def copy_select_list(columns):
+    """
+    Builds the SELECT list that maps staged JSON documents onto table columns.
+
+    Args:
+        columns (list): (column_name, sql_type) tuples; the JSON key is the lower-cased column name.
+
+    Returns:
+        str: A comma-separated list such as '$1:"url"::VARCHAR'.
+    """
+    return ", ".join(f'$1:"{name.lower()}"::{sql_type}' for name, sql_type in columns)
+
+def bulk_load(session, table_name, rows, columns, max_file_bytes=BULK_FILE_MAX_BYTES):
+    """
+    Loads rows into a Snowflake table through an internal stage and a single COPY INTO.
+
+    Rows are reduced to the target columns and written to local gzip NDJSON files (see
+    write_ndjson_files), uploaded to a
+    temporary internal stage with one parallel PUT and then loaded with one COPY INTO statement,
+    which lets the warehouse ingest the files in parallel. Staged files are purged after loading
+    and the local files are removed.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        table_name (str): The table to load into.
+        rows (iterable): Dictionaries keyed by lower-cased column names.
+        columns (list): (column_name, sql_type) tuples describing the target columns.
+        max_file_bytes (int, optional): Uncompressed size at which a new file is started.
+            Defaults to BULK_FILE_MAX_BYTES.
+
+    Returns:
+        int: The number of rows loaded, as reported by COPY INTO.
+
+    Raises:
+        Exception: If the PUT or COPY INTO fails due to permissions, connectivity, or data errors.
+    """
+    # Unique stage sub-path so concurrent loads never pick up each other's files
+    load_id = f"{table_name.lower()}_{uuid.uuid4().hex}"
+    # Only stage the keys that are loaded; rows may carry extra fields for other stages
+    keys = [name.lower() for name, _ in columns]
+    rows = ({key: row.get(key) for key in keys} for row in rows)
+    with tempfile.TemporaryDirectory(prefix="bulk_load_") as directory:
+        with metrics.stage("bulk_write_files", table=table_name):
+            paths = write_ndjson_files(rows, directory, load_id, max_file_bytes)
+        if not paths:
+            return 0
+        staged_bytes = sum(os.path.getsize(path) for path in paths)
+        run_query(session, f"CREATE TEMPORARY STAGE IF NOT EXISTS {BULK_STAGE}")
+        # Upload all files with one PUT; the files are already gzipped
+        local_pattern = os.path.join(directory, f"{load_id}_*.json.gz").replace("\\", "/")
+        with metrics.stage("bulk_put", table=table_name):
+            session.file.put(
+                f"file://{local_pattern}",
+                f"@{BULK_STAGE}/{load_id}",
+                auto_compress=False,
+                parallel=BULK_PUT_PARALLEL,
+                overwrite=True
+            )
+    column_list = ", ".join(name for name, _ in columns)
+    with metrics.stage("bulk_copy", table=table_name):
+        copy_results = run_query(session, f"""
+            COPY INTO {table_name} ({column_list})
+            FROM (SELECT {copy_select_list(columns)} FROM @{BULK_STAGE}/{load_id}/)
+            FILE_FORMAT = (TYPE = JSON COMPRESSION = GZIP)
+            ON_ERROR = ABORT_STATEMENT
+            PURGE = TRUE
+        """)
+    # COPY INTO returns one row per file with a rows_loaded column
+    loaded = sum(int(_row_value(r, "rows_loaded") or 0) for r in copy_results)
+    metrics.incr("rows_uploaded", loaded, table=table_name)
+    metrics.incr("bytes_uploaded", staged_bytes, table=table_name)
+    metrics.incr("files_uploaded", len(paths), table=table_name)
+    logger.info(f"Bulk loaded {loaded} rows into {table_name} from {len(paths)} file(s).")
+    return loaded
+
+def _row_value(row, key):
+    """
+    Reads a column from a Snowpark Row, returning None when it is absent.
+    """
+    try:
+        return row.as_dict().get(key)
+    except AttributeError:
+        return None
@@ -0,0 +1,223 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from .config import logger, SCRAPE_CACHE_PATH, SCRAPE_CACHE_TTL, SCRAPE_CACHE_MAX_BYTES
+from .scraper import is_successful
+
+def cache_key(url, params):
+    """
+    Builds the cache key for a single URL scraped with a given set of parameters.
+
+    Args:
+        url (str): The URL being scraped.
+        params (dict): Parameters passed to the Spider client's scrape_url method.
+
+    Returns:
+        str: The hex-encoded SHA-256 digest of the URL and canonicalised parameters.
+    """
+    canonical = json.dumps({"url": url, "params": params or {}}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ScrapeCache:
+    """
+    On-disk, content-addressed cache of Spider responses backed by SQLite.
+
+    Each (URL, params) key points at a gzip-compressed blob identified by the SHA-256 of its
+    contents, so identical responses are stored once. Entries older than ttl seconds are ignored
+    and removed, and once the stored blobs exceed max_bytes the least recently used entries are
+    evicted. The cache is safe to share between threads.
+
+    Args:
+        path (str, optional): Location of the SQLite database. Defaults to SCRAPE_CACHE_PATH.
+        ttl (int, optional): Seconds an entry stays valid; 0 or less disables expiry. Defaults to SCRAPE_CACHE_TTL.
+        max_bytes (int, optional): Maximum total size of the compressed blobs. Defaults to SCRAPE_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, path=SCRAPE_CACHE_PATH, ttl=SCRAPE_CACHE_TTL, max_bytes=SCRAPE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest TEXT PRIMARY KEY,  -- SHA-256 of the uncompressed payload
+                    data BLOB NOT NULL,       -- gzip-compressed JSON payload
+                    size INTEGER NOT NULL     -- Compressed size in bytes
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,       -- cache_key(url, params)
+                    url TEXT NOT NULL,          -- URL the entry was stored for
+                    digest TEXT NOT NULL,       -- Blob holding the response
+                    created_at REAL NOT NULL,   -- When the response was fetched
+                    accessed_at REAL NOT NULL   -- Last read, used for LRU eviction
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+            # Running total of blob sizes, so puts don't have to re-sum the table
+            self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def get(self, url, params):
+        """
+        Returns the cached response for a URL, or None if it is missing or expired.
+
+        Args:
+            url (str): The URL that was scraped.
+            params (dict): Parameters the URL was scraped with.
+
+        Returns:
+            list | None: The cached list of Spider result dictionaries.
+        """
+        key = cache_key(url, params)
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT e.created_at, b.data FROM entries e JOIN blobs b ON b.digest = e.digest WHERE e.key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            created_at, data = row
+            if self.ttl > 0 and now - created_at > self.ttl:
+                # Expired entries are dropped on read so they are re-fetched
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(gzip.decompress(data))
+
+    def put(self, url, params, results):
+        """
+        Stores the response for a URL, then evicts entries if the cache is over its size limit.
+
+        Args:
+            url (str): The URL that was scraped.
+            params (dict): Parameters the URL was scraped with.
+            results (list): The Spider result dictionaries for the URL.
+        """
+        payload = json.dumps(results, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(payload).hexdigest()
+        data = gzip.compress(payload)
+        now = time.time()
+        with self.lock, self.conn:
+            # Identical payloads share a single blob
+            inserted = self.conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, data, size) VALUES (?, ?, ?)",
+                (digest, data, len(data))
+            ).rowcount
+            self.total_bytes += len(data) if inserted else 0
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, url, digest, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (cache_key(url, params), url, digest, now, now)
+            )
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Removes expired entries and unreferenced blobs, then least recently used entries until
+        the cache is back under 90% of max_bytes, so eviction doesn't run on every put.
+
+        Must be called with the lock held inside a transaction.
+        """
+        if self.ttl > 0:
+            self.conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        self.conn.execute("DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM entries)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        target_bytes = int(self.max_bytes * 0.9)
+        # Walk entries from least to most recently used, dropping them until enough space is freed
+        cursor = self.conn.execute("SELECT key, digest FROM entries ORDER BY accessed_at")
+        for key, digest in cursor.fetchall():
+            if self.total_bytes <= target_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            # Blobs shared with other entries stay until their last reference is evicted
+            if not self.conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                size = self.conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()[0]
+                self.conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                self.total_bytes -= size
+        logger.debug(f"Scrape cache evicted entries down to {self.total_bytes} bytes.")
+
+    def close(self):
+        """
+        Closes the underlying SQLite connection.
+        """
+        with self.lock:
+            self.conn.close()
+
+def _is_cacheable(result):
+    """
+    Returns True for Spider results worth caching.
+
+    Uses the scraper's own success test, so a result the scraper would retry (an error, a
+    status other than 200, or empty content) is never cached and served back to it.
+    """
+    return is_successful(result)
+
+class CachedSpider:
+    """
+    Wraps a Spider client so scrape_url calls are served from a ScrapeCache where possible.
+
+    Comma-separated batches are split per URL: cached URLs are answered locally and only the
+    misses are sent to the wrapped client, as a single smaller batch. Successful results are
+    stored per URL. In offline mode nothing is sent to the network and misses simply return no
+    results, which the scraper treats like failed fetches; this replays a previous run.
+
+    Args:
+        client (Spider | None): The client used for cache misses; may be None when offline.
+        cache (ScrapeCache): The cache to read from and write to.
+        offline (bool, optional): Serve from the cache only. Defaults to False.
+    """
+
+    def __init__(self, client, cache, offline=False):
+        self.client = client
+        self.cache = cache
+        self.offline = offline
+
+    def scrape_url(self, url, params=None):
+        """
+        Scrapes one URL or a comma-separated batch of URLs, consulting the cache first.
+
+        Args:
+            url (str): A URL or a comma-separated list of URLs.
+            params (dict, optional): Parameters to pass to the Spider client's scrape_url method.
+
+        Returns:
+            list: The Spider result dictionaries for the URLs that were available.
+        """
+        urls = url.split(',')
+        results = []
+        misses = []
+        for u in urls:
+            cached = self.cache.get(u, params)
+            if cached is None:
+                misses.append(u)
+            else:
+                results.extend(cached)
+        if not misses:
+            return results
+        if self.offline:
+            logger.warning(f"Replay mode: {len(misses)} URL(s) not in the scrape cache.")
+            return results
+        fetched = self.client.scrape_url(','.join(misses), params=params) or []
+        # Store successful results under the URL they were requested for
+        if len(misses) == 1:
+            if fetched and all(_is_cacheable(r) for r in fetched):
+                self.cache.put(misses[0], params, fetched)
+        else:
+            requested = set(misses)
+            for res in fetched:
+                if res.get('url') in requested and _is_cacheable(res):
+                    self.cache.put(res['url'], params, [res])
+        return results + fetched
@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from .config import logger, CHECKPOINT_PATH, CHECKPOINT_COMPACT_BYTES
+from .hashing import utc_timestamp
+
+def _new_section_state():
+    """
+    Returns the empty resume state of a section.
+    """
+    return {
+        'nav': None,  # Navigation entries scraped for the section, once fetched
+        'nav_uploaded': False,  # Whether the navigation data was written to Snowflake
+        'pending': None,  # URLs an incremental plan chose to scrape, when known
+        'claimed': None,  # URLs the section claimed in the run-wide URL index
+        'batches': {},  # URL -> scraped row that has not been uploaded yet
+        'committed': set(),  # URLs whose text was written to Snowflake
+        'done': False,  # Whether the whole section completed
+    }
+
+class CheckpointJournal:
+    """
+    Durable, append-only journal of a run's progress, used to resume an interrupted run.
+
+    Every completed step is appended to a JSON Lines file: fetched navigation trees,
+    navigation uploads, the URLs each section claimed, scraped text batches (with their
+    content), committed text upload chunks and finished sections. Records are fsynced before
+    the pipeline moves on, except scraped batches: losing one in a crash only means its pages
+    are scraped again, which is cheaper than forcing every page body to disk. When a run is
+    resumed the journal is replayed into a per-section state: finished sections are skipped,
+    navigation is neither fetched nor uploaded again, rows that were scraped but not uploaded
+    are uploaded without being scraped again, and committed pages are left alone.
+
+    The journal is compacted when it is resumed and whenever `compact_bytes` have been
+    appended since the last compaction, so it only holds what a further resume would still
+    need: committed pages are kept as URLs, and only rows not uploaded yet keep their content.
+    After a successful run discard() deletes it.
+
+    A crash between a Snowflake write and its journal record can make a resumed run repeat
+    that one chunk. A torn final line (a crash mid-write) is ignored. All methods are
+    thread-safe.
+
+    Args:
+        path (str, optional): Location of the journal file. Defaults to CHECKPOINT_PATH.
+        resume (bool, optional): Load the existing journal instead of starting a new one.
+            Defaults to False.
+        incremental (bool, optional): Whether a new run is incremental. A resumed run keeps
+            the mode recorded in the journal. Defaults to False.
+        compact_bytes (int, optional): Bytes appended between compactions; 0 or less only
+            compacts on resume. Defaults to CHECKPOINT_COMPACT_BYTES.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, resume=False, incremental=False,
+                 compact_bytes=CHECKPOINT_COMPACT_BYTES):
+        self.path = path
+        self.incremental = incremental
+        self.compact_bytes = compact_bytes
+        self.lock = threading.Lock()
+        self.sections = defaultdict(_new_section_state)  # Journaled state, kept current as records are added
+        self.resumed = False  # Whether an earlier run's journal was loaded
+        self.appended = 0  # Bytes appended since the journal was last rewritten
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+            self._compact()
+            self.resumed = True
+            done = sorted(name for name, state in self.sections.items() if state['done'])
+            logger.info(
+                f"Resuming from checkpoint {path}: {len(done)} section(s) already completed {done}."
+            )
+        else:
+            if resume:
+                logger.warning(f"No checkpoint found at {path}; starting a new run.")
+            self._rewrite([{'type': 'run', 'incremental': incremental, 'started_at': utc_timestamp()}])
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        """
+        Replays the journal file into the per-section resume state.
+        """
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by a crash; anything after it is unusable
+                    logger.warning(f"Ignoring incomplete checkpoint record at {self.path}:{line_number}.")
+                    break
+                self._apply(record)
+
+    def _apply(self, record):
+        """
+        Applies one journal record to the resume state.
+        """
+        kind = record['type']
+        if kind == 'run':
+            self.incremental = record.get('incremental', False)
+            return
+        state = self.sections[record['section']]
+        if kind == 'nav':
+            state['nav'] = record['entries']
+        elif kind == 'nav_uploaded':
+            state['nav_uploaded'] = True
+            state['pending'] = record.get('pending')
+        elif kind == 'claimed':
+            state['claimed'] = record['urls']
+        elif kind == 'batch':
+            for row in record['rows']:
+                if row['url'] not in state['committed']:
+                    state['batches'][row['url']] = row
+        elif kind == 'chunk':
+            for url in record['urls']:
+                state['committed'].add(url)
+                state['batches'].pop(url, None)  # Uploaded content no longer needs to be kept
+        elif kind == 'done':
+            state['done'] = True
+
+    def _compact(self):
+        """
+        Rewrites the journal with only the records needed to rebuild the current state.
+
+        Must not run concurrently with _append; the caller reopens the journal file.
+        """
+        records = [{'type': 'run', 'incremental': self.incremental, 'started_at': utc_timestamp()}]
+        for section_name, state in self.sections.items():
+            if state['nav'] is not None:
+                records.append({'type': 'nav', 'section': section_name, 'entries': state['nav']})
+            if state['nav_uploaded']:
+                records.append({'type': 'nav_uploaded', 'section': section_name, 'pending': state['pending']})
+            if state['claimed'] is not None:
+                records.append({'type': 'claimed', 'section': section_name, 'urls': state['claimed']})
+            if state['committed']:
+                records.append({'type': 'chunk', 'section': section_name, 'urls': sorted(state['committed'])})
+            if state['batches']:
+                records.append({'type': 'batch', 'section': section_name, 'rows': list(state['batches'].values())})
+            if state['done']:
+                records.append({'type': 'done', 'section': section_name})
+        self._rewrite(records)
+
+    def _rewrite(self, records):
+        """
+        Atomically replaces the journal file with the given records.
+        """
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.appended = 0
+
+    def _append(self, record, sync=True):
+        """
+        Appends a record and applies it to the journaled state.
+
+        With `sync` the record is forced to disk before returning. Once enough has been
+        appended since the last rewrite, the journal is compacted.
+        """
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            if sync:
+                os.fsync(self.file.fileno())
+            self._apply(record)
+            self.appended += len(line)
+            if 0 < self.compact_bytes <= self.appended:
+                self.file.close()
+                self._compact()
+                self.file = open(self.path, "a", encoding="utf-8")
+
+    def section_state(self, section_name):
+        """
+        Returns what an earlier run already completed for a section.
+
+        Args:
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+        Returns:
+            dict | None: A copy of the section's resume state, or None if the journal has
+                nothing for it.
+        """
+        with self.lock:
+            state = self.sections.get(section_name)
+            if state is None:
+                return None
+            # The journaled state keeps changing as this run records its own progress
+            return dict(state, batches=dict(state['batches']), committed=set(state['committed']))
+
+    def claims(self):
+        """
+        Returns the URLs each section claimed in earlier runs, keyed by section name.
+        """
+        with self.lock:
+            return {name: state['claimed'] for name, state in self.sections.items() if state['claimed']}
+
+    def record_nav(self, section_name, tree_data):
+        """
+        Records a section's fetched navigation entries.
+        """
+        self._append({'type': 'nav', 'section': section_name, 'entries': tree_data})
+
+    def record_nav_uploaded(self, section_name, pending=None):
+        """
+        Records that a section's navigation data was written to Snowflake.
+
+        Args:
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+            pending (list, optional): The entries an incremental plan chose to scrape.
+                Defaults to None (a full run scrapes every entry).
+        """
+        urls = [entry['url'] for entry in pending] if pending is not None else None
+        self._append({'type': 'nav_uploaded', 'section': section_name, 'pending': urls})
+
+    def record_claimed(self, section_name, urls):
+        """
+        Records the URLs a section claimed in the run-wide URL index.
+        """
+        self._append({'type': 'claimed', 'section': section_name, 'urls': list(urls)})
+
+    def record_batch(self, section_name, rows):
+        """
+        Records a scraped batch of text rows, including their content, without forcing it to disk.
+        """
+        self._append({'type': 'batch', 'section': section_name, 'rows': rows}, sync=False)
+
+    def record_chunk(self, section_name, urls):
+        """
+        Records that the text of the given URLs was written to Snowflake.
+        """
+        self._append({'type': 'chunk', 'section': section_name, 'urls': list(urls)})
+
+    def record_section_done(self, section_name):
+        """
+        Records that a section finished completely.
+        """
+        self._append({'type': 'done', 'section': section_name})
+
+    def discard(self):
+        """
+        Deletes the journal once a run has completed successfully, leaving nothing to resume.
+        The journal should not be used afterwards.
+        """
+        with self.lock:
+            self.file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        logger.info(f"Run completed; removed checkpoint {self.path}.")
+
+    def close(self):
+        """
+        Closes the journal file. The journal should not be used afterwards.
+        """
+        with self.lock:
+            self.file.close()
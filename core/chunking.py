@@ -0,0 +1,253 @@
+import re
+from .config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from .hashing import content_hash
+
+# Markdown ATX heading, e.g. '## Usage notes'
+ATX_HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$')
+# Markdown setext underline below a heading line: '===' (level 1) or '---' (level 2)
+SETEXT_UNDERLINE = re.compile(r'^[ \t]*(=+|-+)[ \t]*$')
+# Opening or closing line of a fenced code block: three or more backticks or tildes
+CODE_FENCE = re.compile(r'^[ \t]{0,3}(`{3,}|~{3,})(.*)$')
+# Blank line(s) separating paragraphs
+PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n')
+# Whitespace following the end of a sentence
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+# Longest line still treated as a setext heading rather than a paragraph above a rule
+MAX_HEADING_CHARS = 120
+
+def estimate_tokens(text):
+    """
+    Estimates the number of model tokens in a piece of text.
+
+    Uses the common rule of thumb of about four characters per token for English prose, which
+    is close enough to size chunks without depending on a specific tokenizer.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+def split_sections(text):
+    """
+    Splits page text into sections at its headings.
+
+    Markdown ATX ('# Title') and setext (a title underlined with '===' or '---') headings
+    start a new section. Each section carries its heading path, e.g. 'Overview > Usage notes',
+    so chunks keep their position in the page. Text before the first heading has an empty path.
+    Lines inside fenced code blocks (``` or ~~~) are never headings, so comments such as
+    '# create a session' stay in the code.
+
+    Args:
+        text (str): The page's text content.
+
+    Returns:
+        list: (heading_path, body) tuples in page order; sections without a body are dropped.
+    """
+    sections = []
+    headings = []  # (level, title) for the current heading path
+    lines = []  # Body lines of the current section
+    fence = None  # Marker of the open code fence, e.g. '```', or None outside code
+
+    def close_section():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append((" > ".join(title for _, title in headings), body))
+        lines.clear()
+
+    def open_section(level, title):
+        close_section()
+        # A heading replaces every heading at its own level or deeper
+        while headings and headings[-1][0] >= level:
+            headings.pop()
+        headings.append((level, title))
+
+    for line in text.splitlines():
+        fence, in_code = _track_fence(line, fence)
+        if in_code:
+            lines.append(line)
+            continue
+        atx = ATX_HEADING.match(line)
+        if atx:
+            open_section(len(atx.group(1)), atx.group(2))
+            continue
+        setext = SETEXT_UNDERLINE.match(line)
+        if setext and lines and lines[-1].strip() and len(lines[-1].strip()) <= MAX_HEADING_CHARS:
+            title = lines.pop().strip()
+            open_section(1 if setext.group(1)[0] == '=' else 2, title)
+            continue
+        lines.append(line)
+    close_section()
+    return sections
+
+def _track_fence(line, fence):
+    """
+    Updates the open code fence for a line, returning (fence, is_code_line).
+
+    Opening and closing fence lines count as code. A fence is closed by a line of the same
+    character that is at least as long and carries no info string.
+    """
+    match = CODE_FENCE.match(line)
+    if fence is None:
+        if match and not (match.group(1)[0] == '`' and '`' in match.group(2)):
+            return match.group(1), True
+        return None, False
+    if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) and not match.group(2).strip():
+        return None, True
+    return fence, True
+
+def _paragraphs(body):
+    """
+    Splits a section body into paragraphs, keeping each fenced code block in one piece.
+    """
+    paragraphs = []
+    fence = None
+    for paragraph in PARAGRAPH_BREAK.split(body):
+        if fence is not None and paragraphs:
+            # Blank lines inside code don't end the block
+            paragraphs[-1] = f"{paragraphs[-1]}\n\n{paragraph}"
+        else:
+            paragraphs.append(paragraph)
+        for line in paragraph.splitlines():
+            fence, _ = _track_fence(line, fence)
+    return paragraphs
+
+def _split_long_unit(text, max_tokens):
+    """
+    Splits a paragraph that is too long for one chunk into sentence-aligned pieces.
+
+    Sentences that are themselves too long are cut at the last space before the character
+    limit, or at the limit itself when there is no space.
+    """
+    max_chars = max_tokens * 4
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_BREAK.split(text):
+        # Hard-cut sentences that can never fit
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _tail_words(text, max_tokens):
+    """
+    Returns the trailing words of text that fit in max_tokens estimated tokens.
+    """
+    tail = text[-max_tokens * 4:]
+    if len(tail) < len(text):
+        # Drop the word that was cut in half
+        space = tail.find(" ")
+        tail = tail[space + 1:] if space >= 0 else ""
+    return tail.strip()
+
+def chunk_text(text, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Splits page text into heading-aware, overlapping chunks for retrieval.
+
+    The text is first split into sections at its headings (see split_sections), so no chunk
+    spans two sections. Each section's paragraphs are packed into chunks of up to max_tokens
+    estimated tokens; a fenced code block counts as one paragraph, even across blank lines,
+    and paragraphs that are too long are split at sentence boundaries. Each new chunk repeats
+    trailing paragraphs of the previous chunk in the same section, up to overlap_tokens, so
+    context that straddles a boundary is not lost; when even the last paragraph is longer
+    than that, its trailing words are repeated instead.
+
+    Args:
+        text (str): The page's text content.
+        max_tokens (int, optional): Estimated tokens per chunk. Defaults to CHUNK_MAX_TOKENS.
+        overlap_tokens (int, optional): Estimated tokens repeated from the previous chunk.
+            Defaults to CHUNK_OVERLAP_TOKENS.
+
+    Returns:
+        list: Dictionaries with 'heading', 'content' and 'token_estimate' keys, in page order.
+    """
+    chunks = []
+    for heading, body in split_sections(text or ""):
+        units = []  # Paragraphs, or pieces of paragraphs too long for one chunk
+        for paragraph in _paragraphs(body):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if estimate_tokens(paragraph) > max_tokens:
+                units.extend(_split_long_unit(paragraph, max_tokens))
+            else:
+                units.append(paragraph)
+
+        current = []  # Units in the chunk being built
+        current_tokens = 0
+        for unit in units:
+            unit_tokens = estimate_tokens(unit)
+            if current and current_tokens + unit_tokens > max_tokens:
+                content = "\n\n".join(current)
+                chunks.append({'heading': heading, 'content': content, 'token_estimate': estimate_tokens(content)})
+                # Carry trailing units over into the next chunk as overlap
+                carried = []
+                carried_tokens = 0
+                for previous in reversed(current):
+                    previous_tokens = estimate_tokens(previous)
+                    if carried_tokens + previous_tokens > overlap_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous_tokens
+                if not carried and overlap_tokens > 0:
+                    tail = _tail_words(current[-1], overlap_tokens)
+                    if tail:
+                        carried, carried_tokens = [tail], estimate_tokens(tail)
+                # Drop the overlap rather than exceed the chunk size
+                if carried_tokens + unit_tokens > max_tokens:
+                    carried, carried_tokens = [], 0
+                current, current_tokens = carried, carried_tokens
+            current.append(unit)
+            current_tokens += unit_tokens
+        if current:
+            content = "\n\n".join(current)
+            chunks.append({'heading': heading, 'content': content, 'token_estimate': estimate_tokens(content)})
+    return chunks
+
+def chunk_pages(pages, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Chunks a group of pages into rows for the ONLINE_RESOURCES_CHUNKS table.
+
+    This is the unit of work sent to the chunking process pool, so it only takes and returns
+    plain, picklable data.
+
+    Args:
+        pages (list): Dictionaries with 'url', 'content' and 'section' keys, plus optional
+            'depth', 'parent_url' and 'content_hash' keys.
+        max_tokens (int, optional): Estimated tokens per chunk. Defaults to CHUNK_MAX_TOKENS.
+        overlap_tokens (int, optional): Estimated tokens repeated from the previous chunk.
+            Defaults to CHUNK_OVERLAP_TOKENS.
+
+    Returns:
+        list: Chunk rows keyed by the lower-cased ONLINE_RESOURCES_CHUNKS column names.
+    """
+    rows = []
+    for page in pages:
+        page_hash = page.get('content_hash') or content_hash(page['content'])
+        for index, chunk in enumerate(chunk_text(page['content'], max_tokens, overlap_tokens)):
+            rows.append({
+                'url': page['url'],
+                'section': page['section'],
+                'chunk_index': index,
+                'heading': chunk['heading'],
+                'content': chunk['content'],
+                'token_estimate': chunk['token_estimate'],
+                'depth': page.get('depth'),
+                'parent_url': page.get('parent_url'),
+                'content_hash': page_hash,
+            })
+    return rows
@@ -17,6 +17,65 @@ SNOWFLAKE_DATABASE  = os.getenv("SNOWFLAKE_DATABASE")
 SNOWFLAKE_SCHEMA    = os.getenv("SNOWFLAKE_SCHEMA")
 SNOWFLAKE_WAREHOUSE   = os.getenv("SNOWFLAKE_WAREHOUSE")
 
+# Scraping parameters
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "4"))  # Spider batch requests kept in flight
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "2"))  # Sections scraped at the same time
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "4"))  # Scraped items waiting for upload
+SNOWFLAKE_POOL_SIZE = int(os.getenv("SNOWFLAKE_POOL_SIZE", str(SECTION_CONCURRENCY)))  # Snowflake sessions, one upload thread each
+
+# Request scheduling parameters
+SPIDER_RATE_LIMIT = float(os.getenv("SPIDER_RATE_LIMIT", "2"))  # Spider requests started per second at most
+SPIDER_MIN_RATE = float(os.getenv("SPIDER_MIN_RATE", "0.2"))  # Floor the rate backs off to while throttled
+SPIDER_BURST = int(os.getenv("SPIDER_BURST", "4"))  # Requests that may start back to back after an idle period
+SPIDER_MAX_IN_FLIGHT = int(os.getenv("SPIDER_MAX_IN_FLIGHT", "8"))  # Spider requests in flight across all sections
+SPIDER_CREDIT_BUDGET = float(os.getenv("SPIDER_CREDIT_BUDGET", "0"))  # Spider cost (costs.total_cost) a run may spend; 0 is unlimited
+SPIDER_COST_PER_PAGE = float(os.getenv("SPIDER_COST_PER_PAGE", "0.001"))  # Estimated cost of a page until real costs are reported
+SCHEDULER_STATS_INTERVAL = float(os.getenv("SCHEDULER_STATS_INTERVAL", "30"))  # Seconds between scheduler progress logs
+
+# Retry scheduling parameters
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))  # Seconds before a URL's first retry
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))  # Upper bound on a URL's backoff
+NAV_FETCH_ATTEMPTS = int(os.getenv("NAV_FETCH_ATTEMPTS", "4"))  # Tries per navigation fetch on transient errors
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # Failed batches in a row that open the breaker
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # Seconds the breaker stays open
+BATCH_TARGET_LATENCY = float(os.getenv("BATCH_TARGET_LATENCY", "120"))  # Batch seconds above which batches shrink
+
+# Bulk loading parameters
+BULK_FILE_MAX_BYTES = int(os.getenv("BULK_FILE_MAX_BYTES", str(64 * 1024 * 1024)))  # Uncompressed bytes per staged file
+BULK_PUT_PARALLEL = int(os.getenv("BULK_PUT_PARALLEL", "4"))  # Threads used by PUT to upload staged files
+STREAM_FLUSH_ROWS = int(os.getenv("STREAM_FLUSH_ROWS", "1000"))  # Buffered text rows that trigger a flush
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", str(32 * 1024 * 1024)))  # Buffered content bytes that trigger a flush
+
+# Local scrape cache parameters
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", os.path.join(".scrape_cache", "cache.sqlite3"))  # SQLite cache file
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds before a cached response expires
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # Compressed cache size limit
+
+# Incremental crawl parameters
+INCREMENTAL_REVALIDATE_DAYS = int(os.getenv("INCREMENTAL_REVALIDATE_DAYS", "30"))  # Re-fetch unchanged pages older than this
+
+# Chunking parameters
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))  # Estimated tokens per chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))  # Estimated tokens repeated from the previous chunk
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", str(os.cpu_count() or 1)))  # Chunking processes; 0 disables chunking
+
+# Near-duplicate detection parameters
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.9"))  # Estimated Jaccard similarity that marks a near-duplicate
+DEDUPE_NUM_PERM = int(os.getenv("DEDUPE_NUM_PERM", "128"))  # MinHash permutations per page
+DEDUPE_BANDS = int(os.getenv("DEDUPE_BANDS", "16"))  # LSH bands; must divide DEDUPE_NUM_PERM
+DEDUPE_SHINGLE_WORDS = int(os.getenv("DEDUPE_SHINGLE_WORDS", "5"))  # Words per shingle
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "5"))  # Pages a paragraph must appear on to be boilerplate
+BOILERPLATE_MIN_CHARS = int(os.getenv("BOILERPLATE_MIN_CHARS", "80"))  # Shorter paragraphs are never treated as boilerplate
+
+# Sitemap discovery parameters
+SITEMAP_URL = os.getenv("SITEMAP_URL", f"{BASE_URL}/sitemap.xml")  # Sitemap (or sitemap index) listing every page
+SITEMAP_INDEX_PATH = os.getenv("SITEMAP_INDEX_PATH", os.path.join(".scrape_cache", "sitemap.sqlite3"))  # Local URL -> lastmod index
+SITEMAP_TIMEOUT = float(os.getenv("SITEMAP_TIMEOUT", "60"))  # Seconds to wait for the sitemap server
+
+# Checkpoint journal parameters
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(".scrape_checkpoint", "journal.jsonl"))  # Journal used by --resume
+CHECKPOINT_COMPACT_BYTES = int(os.getenv("CHECKPOINT_COMPACT_BYTES", str(64 * 1024 * 1024)))  # Journal growth that triggers a compaction
+
 # Logging setup
 logging.basicConfig(
     level=logging.INFO,
@@ -0,0 +1,351 @@
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict
+import numpy as np
+from .config import (
+    logger, DEDUPE_THRESHOLD, DEDUPE_NUM_PERM, DEDUPE_BANDS, DEDUPE_SHINGLE_WORDS,
+    BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_CHARS
+)
+from .hashing import content_hash, utc_timestamp
+from .metrics import metrics, _write_atomically
+
+# Blank line(s) separating paragraphs
+PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n')
+# Multiplier of the rolling shingle hash (any large odd 64-bit constant)
+SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# Bits of a scrambled shingle hash kept as its value; the bits above choose its bin
+BIN_SHIFT = 40
+VALUE_MASK = np.uint64((1 << BIN_SHIFT) - 1)
+# Marker for a bin that no shingle hashed into
+EMPTY_BIN = np.uint64(2 ** 64 - 1)
+# Placeholder left in collapsed content where a boilerplate paragraph was removed
+BOILERPLATE_MARKER = "{{{{boilerplate:{}}}}}"
+
+def paragraph_hash(paragraph):
+    """
+    Returns a short, stable hash identifying a paragraph, ignoring whitespace differences.
+    """
+    normalized = " ".join(paragraph.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+def _mix64(values):
+    """
+    Scrambles 64-bit hashes with the splitmix64 finaliser so every bit depends on every input bit.
+    """
+    with np.errstate(over="ignore"):
+        values = values ^ (values >> np.uint64(30))
+        values = values * np.uint64(0xBF58476D1CE4E5B9)
+        values = values ^ (values >> np.uint64(27))
+        values = values * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+class MinHasher:
+    """
+    Computes MinHash signatures of text with numpy, using one-permutation hashing.
+
+    Text is lower-cased and split on whitespace; every run of shingle_words consecutive words
+    is a shingle. Words are hashed with Python's built-in string hash and shingle hashes are
+    built with a vectorised rolling hash. Instead of applying num_perm separate permutations,
+    each shingle hash is scrambled once and its top bits pick one of num_perm bins; the
+    signature is the minimum value in every bin, and empty bins borrow the value of the next
+    non-empty bin (rotation densification). This costs one pass over the shingles rather than
+    num_perm, while the fraction of equal signature positions between two pages still
+    estimates the Jaccard similarity of their shingle sets. String hashes are salted per
+    process, so signatures are only comparable within one run.
+
+    Args:
+        num_perm (int, optional): Signature length. Defaults to DEDUPE_NUM_PERM.
+        shingle_words (int, optional): Words per shingle. Defaults to DEDUPE_SHINGLE_WORDS.
+        seed (int, optional): Seed mixed into every hash. Signatures are only comparable
+            between hashers with the same seed. Defaults to 1.
+    """
+
+    def __init__(self, num_perm=DEDUPE_NUM_PERM, shingle_words=DEDUPE_SHINGLE_WORDS, seed=1):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.salt = _mix64(np.array([seed], dtype=np.uint64))[0]
+
+    def shingles(self, text):
+        """
+        Returns the distinct 64-bit shingle hashes of text as a numpy array (possibly empty).
+        """
+        tokens = text.lower().split()
+        if not tokens:
+            return np.empty(0, dtype=np.uint64)
+        words = np.fromiter(map(hash, tokens), dtype=np.int64, count=len(tokens)).view(np.uint64)
+        count = max(1, len(words) - self.shingle_words + 1)
+        shingle_hashes = np.zeros(count, dtype=np.uint64)
+        # Rolling polynomial hash over each window of shingle_words words (wraps mod 2**64)
+        with np.errstate(over="ignore"):
+            for offset in range(min(self.shingle_words, len(words))):
+                shingle_hashes = shingle_hashes * SHINGLE_MULTIPLIER + words[offset:offset + count]
+        return np.unique(shingle_hashes)
+
+    def signature(self, text):
+        """
+        Returns the MinHash signature of text, or None when it has no words.
+
+        Args:
+            text (str): The text to sign.
+
+        Returns:
+            numpy.ndarray | None: num_perm uint32 values.
+        """
+        shingle_hashes = self.shingles(text)
+        if shingle_hashes.size == 0:
+            return None
+        mixed = _mix64(shingle_hashes ^ self.salt)
+        # Top bits choose the bin, the low bits are the value minimised within it
+        bins = ((mixed >> np.uint64(BIN_SHIFT)) % np.uint64(self.num_perm)).astype(np.intp)
+        signature = np.full(self.num_perm, EMPTY_BIN, dtype=np.uint64)
+        np.minimum.at(signature, bins, mixed & VALUE_MASK)
+        empty = signature == EMPTY_BIN
+        if empty.any():
+            # Rotation densification: borrow from the next non-empty bin, tagged with the distance
+            filled = np.flatnonzero(~empty)
+            positions = np.arange(self.num_perm)
+            nearest = filled[np.searchsorted(filled, positions) % filled.size]
+            distance = ((nearest - positions) % self.num_perm).astype(np.uint64)
+            signature = signature[nearest] | (distance << np.uint64(BIN_SHIFT))
+        # Fold each 64-bit slot to 32 bits to halve the index's memory
+        return (_mix64(signature) >> np.uint64(32)).astype(np.uint32)
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing index over MinHash signatures.
+
+    Signatures are cut into `bands` bands; pages sharing any whole band land in the same
+    bucket and become candidates, so only a handful of pages are compared per lookup instead
+    of the whole corpus. With 16 bands of 8 values, pages with a Jaccard similarity of 0.9
+    are found with probability above 0.99, while pages below 0.5 rarely collide.
+
+    Args:
+        num_perm (int, optional): Signature length. Defaults to DEDUPE_NUM_PERM.
+        bands (int, optional): Number of bands; must divide num_perm. Defaults to DEDUPE_BANDS.
+
+    Raises:
+        ValueError: If bands does not divide num_perm.
+    """
+
+    def __init__(self, num_perm=DEDUPE_NUM_PERM, bands=DEDUPE_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"LSH bands ({bands}) must divide the signature length ({num_perm})")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.buckets = defaultdict(list)  # (band, hash of band values) -> keys
+        self.signatures = {}  # key -> signature
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def query(self, signature, threshold):
+        """
+        Finds the most similar indexed signature at or above a similarity threshold.
+
+        Args:
+            signature (numpy.ndarray): The signature to look up.
+            threshold (float): Minimum estimated Jaccard similarity.
+
+        Returns:
+            tuple | None: (key, similarity) of the best match, or None.
+        """
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        best = None
+        for key in candidates:
+            similarity = float(np.mean(self.signatures[key] == signature))
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def insert(self, key, signature):
+        """
+        Adds a signature to the index under key.
+        """
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets[band_key].append(key)
+
+    def __len__(self):
+        return len(self.signatures)
+
+class NearDuplicateDetector:
+    """
+    Finds near-duplicate pages and shared boilerplate paragraphs among scraped content.
+
+    Pages are processed as they are uploaded. A page whose content is identical to, or has an
+    estimated Jaccard similarity of at least `threshold` with, an earlier page is a duplicate
+    of that page; other pages are added to the LSH index as cluster representatives.
+    Paragraphs of at least BOILERPLATE_MIN_CHARS characters that appear on `boilerplate_pages`
+    different pages are boilerplate, and each is reported once.
+
+    In flag mode content is stored unchanged and duplicates are only reported. In collapse
+    mode a duplicate's content is not stored at all: its row keeps the content hash so change
+    detection still works, and 'duplicate_of' names the page holding the content. Known
+    boilerplate paragraphs are replaced by a short marker that references the single stored
+    copy. Boilerplate is only known once it has been seen on enough pages, so the first pages
+    that contain it keep it in full.
+
+    The detector keeps state for the whole run. All methods are thread-safe, so one detector
+    can be shared by every upload thread.
+
+    Args:
+        collapse (bool, optional): Collapse duplicates and boilerplate instead of only
+            flagging them. Defaults to False.
+        threshold (float, optional): Similarity that marks a near-duplicate. Defaults to DEDUPE_THRESHOLD.
+        boilerplate_pages (int, optional): Pages a paragraph must appear on to be boilerplate.
+            Defaults to BOILERPLATE_MIN_PAGES.
+        hasher (MinHasher, optional): Signature generator. Defaults to a new MinHasher.
+        index (LSHIndex, optional): Index of representative pages. Defaults to a new LSHIndex.
+    """
+
+    def __init__(self, collapse=False, threshold=DEDUPE_THRESHOLD, boilerplate_pages=BOILERPLATE_MIN_PAGES,
+                 hasher=None, index=None):
+        self.collapse = collapse
+        self.threshold = threshold
+        self.boilerplate_pages = boilerplate_pages
+        self.hasher = hasher or MinHasher()
+        self.index = index or LSHIndex(self.hasher.num_perm)
+        self.exact = {}  # Content hash -> URL of the first page with that content
+        self.paragraph_counts = defaultdict(int)  # Paragraph hash -> pages it appeared on
+        self.boilerplate = set()  # Hashes of paragraphs known to be boilerplate
+        self.duplicates = []  # Every duplicate found: {'url', 'section', 'duplicate_of', 'similarity'}
+        self.lock = threading.Lock()
+
+    def _split_boilerplate(self, row, section_name):
+        """
+        Counts a page's paragraphs and returns (stored_content, new_boilerplate).
+        """
+        paragraphs = [p.strip() for p in PARAGRAPH_BREAK.split(row['content']) if p.strip()]
+        stored_parts = []
+        new_boilerplate = []
+        counted = set()  # A paragraph repeated within one page only counts once
+        for paragraph in paragraphs:
+            if len(paragraph) < BOILERPLATE_MIN_CHARS:
+                stored_parts.append(paragraph)
+                continue
+            digest = paragraph_hash(paragraph)
+            if digest not in counted:
+                counted.add(digest)
+                self.paragraph_counts[digest] += 1
+                if digest not in self.boilerplate and self.paragraph_counts[digest] >= self.boilerplate_pages:
+                    self.boilerplate.add(digest)
+                    new_boilerplate.append({
+                        'hash': digest, 'content': paragraph, 'first_url': row['url'],
+                        'section': section_name, 'detected_at': utc_timestamp(),
+                    })
+            if digest in self.boilerplate:
+                stored_parts.append(BOILERPLATE_MARKER.format(digest) if self.collapse else paragraph)
+            else:
+                stored_parts.append(paragraph)
+        stored = "\n\n".join(stored_parts) if self.collapse else row['content']
+        return stored, new_boilerplate
+
+    def process(self, rows, section_name):
+        """
+        Checks a group of scraped rows for near-duplicates and boilerplate.
+
+        Args:
+            rows (list): Dictionaries with 'url' and 'content' keys. They are not modified.
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+        Returns:
+            tuple: (stored_rows, duplicate_rows, boilerplate_rows). stored_rows are copies of
+                rows to upload in place of them, with 'content_hash' set from the original
+                content (and 'duplicate_of' on collapsed duplicates); duplicate_rows and boilerplate_rows are the findings of this group.
+        """
+        stored_rows = []
+        duplicate_rows = []
+        boilerplate_rows = []
+        saved_bytes = 0
+        with self.lock:
+            for row in rows:
+                content = row.get('content') or ''
+                stored = dict(row, content_hash=content_hash(content))
+                stored_rows.append(stored)
+                if not content:
+                    continue
+                stored['content'], new_boilerplate = self._split_boilerplate(row, section_name)
+                boilerplate_rows.extend(new_boilerplate)
+
+                # Exact copies are found by hash; near-copies through the LSH index
+                match = None
+                if stored['content_hash'] in self.exact:
+                    match = (self.exact[stored['content_hash']], 1.0)
+                else:
+                    # Signatures use the full content: whether a paragraph is boilerplate yet
+                    # depends on processing order, so stripping it would make copies diverge
+                    signature = self.hasher.signature(content)
+                    if signature is not None:
+                        match = self.index.query(signature, self.threshold)
+                        if match is None:
+                            self.index.insert(row['url'], signature)
+                    # Later exact copies point straight at the cluster's representative
+                    self.exact[stored['content_hash']] = match[0] if match is not None else row['url']
+                if match is not None and match[0] != row['url']:
+                    duplicate = {
+                        'url': row['url'], 'section': section_name, 'duplicate_of': match[0],
+                        'similarity': round(match[1], 4), 'detected_at': utc_timestamp(),
+                    }
+                    duplicate_rows.append(duplicate)
+                    self.duplicates.append(duplicate)
+                    if self.collapse:
+                        stored['content'] = ''
+                        stored['duplicate_of'] = match[0]  # Where the page's content is stored
+                saved_bytes += len(content) - len(stored['content'])
+        metrics.incr("duplicates_found", len(duplicate_rows), section=section_name)
+        metrics.incr("boilerplate_paragraphs", len(boilerplate_rows), section=section_name)
+        metrics.incr("dedupe_bytes_saved", saved_bytes, section=section_name)
+        return stored_rows, duplicate_rows, boilerplate_rows
+
+    def clusters(self):
+        """
+        Groups the duplicates found so far by the page they duplicate.
+
+        Returns:
+            list: {'representative', 'members', 'size'} dictionaries, largest cluster first.
+        """
+        members = defaultdict(list)
+        with self.lock:
+            duplicates = list(self.duplicates)
+        for duplicate in duplicates:
+            members[duplicate['duplicate_of']].append(
+                {'url': duplicate['url'], 'section': duplicate['section'], 'similarity': duplicate['similarity']}
+            )
+        clusters = [
+            {'representative': url, 'members': group, 'size': len(group) + 1}
+            for url, group in members.items()
+        ]
+        return sorted(clusters, key=lambda cluster: (-cluster['size'], cluster['representative']))
+
+    def log_summary(self, top=5):
+        """
+        Logs the number of duplicates and boilerplate paragraphs, and the largest clusters.
+        """
+        clusters = self.clusters()
+        logger.info(
+            f"Near-duplicate detection: {len(self.duplicates)} duplicate pages in {len(clusters)} clusters, "
+            f"{len(self.boilerplate)} boilerplate paragraphs, {len(self.index)} distinct pages indexed."
+        )
+        for cluster in clusters[:top]:
+            logger.info(f"  {cluster['size']} pages like {cluster['representative']}")
+
+    def write_report(self, path):
+        """
+        Writes the duplicate clusters and counts as a JSON file.
+
+        Args:
+            path (str): Destination file.
+        """
+        report = {
+            'duplicates': len(self.duplicates),
+            'boilerplate_paragraphs': len(self.boilerplate),
+            'pages_indexed': len(self.index),
+            'clusters': self.clusters(),
+        }
+        _write_atomically(path, json.dumps(report, indent=2))
+        logger.info(f"Wrote duplicate cluster report to {path}")
@@ -0,0 +1,41 @@
+import hashlib
+from datetime import datetime, timezone
+
+# Navigation fields that define whether an entry has changed between runs
+NAV_HASH_FIELDS = ('id', 'label', 'type', 'depth', 'parent_url')
+
+def content_hash(content):
+    """
+    Computes a stable hash of a page's text content.
+
+    Args:
+        content (str): The scraped text content (None is treated as empty).
+
+    Returns:
+        str: The hex-encoded SHA-256 digest of the UTF-8 encoded content.
+    """
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+def nav_entry_hash(entry):
+    """
+    Computes a stable hash of a navigation entry's fields.
+
+    The URL is deliberately excluded because it is the key the hash is stored against; the
+    hash changes whenever the entry's id, label, type, depth or parent changes.
+
+    Args:
+        entry (dict): A navigation entry as produced by extract_tree_data.
+
+    Returns:
+        str: The hex-encoded SHA-256 digest of the entry's fields.
+    """
+    joined = "\x1f".join(str(entry.get(field, "")) for field in NAV_HASH_FIELDS)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+def utc_timestamp():
+    """
+    Returns the current UTC time as an ISO-8601 string without a timezone suffix.
+
+    The format is accepted directly by Snowflake's TIMESTAMP_NTZ casts.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
@@ -0,0 +1,348 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from .config import logger
+
+# Prefix for every metric name in the Prometheus textfile output
+METRIC_PREFIX = "snowflake_docs"
+
+def _label_key(labels):
+    """
+    Turns a labels dict into a hashable, order-independent key.
+    """
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(label_key, extra=()):
+    """
+    Formats a label key as a Prometheus label set, e.g. '{section="guides"}'.
+    """
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for k, v in pairs:
+        value = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{k}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _percentile(ordered, q):
+    """
+    Returns the q-quantile (0.0 to 1.0) of an already sorted list.
+    """
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class RunMetrics:
+    """
+    Collects counters, stage timings, Snowflake query records and optional trace spans for a run.
+
+    All methods are thread-safe. Stage timings are kept as raw samples so percentiles can be
+    reported at the end of the run. Spans are only recorded when tracing is enabled.
+
+    Args:
+        tracing (bool, optional): Record a span for every timed stage. Defaults to False.
+    """
+
+    def __init__(self, tracing=False):
+        self.tracing = tracing
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters = defaultdict(float)  # (name, label_key) -> value
+        self.timings = defaultdict(list)  # (name, label_key) -> durations in seconds
+        self.queries = []  # Snowflake query records
+        self.spans = []  # Finished spans, when tracing is enabled
+        self.local = threading.local()  # Per-thread stack of open span ids
+        self.next_span_id = 0
+
+    def incr(self, name, value=1, **labels):
+        """
+        Adds value to a counter.
+
+        Args:
+            name (str): Counter name, e.g. 'bytes_fetched'.
+            value (float, optional): Amount to add. Defaults to 1.
+            **labels: Label values such as section or table.
+        """
+        with self.lock:
+            self.counters[(name, _label_key(labels))] += value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Records one duration sample for a stage.
+
+        Args:
+            name (str): Stage name, e.g. 'spider_batch'.
+            seconds (float): The measured duration.
+            **labels: Label values such as section or table.
+        """
+        with self.lock:
+            self.timings[(name, _label_key(labels))].append(seconds)
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """
+        Times the enclosed block as one sample of a stage, and records a span when tracing.
+
+        Args:
+            name (str): Stage name, e.g. 'nav_scrape'.
+            **labels: Label values such as section or table.
+        """
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        with self.lock:
+            span_id = self.next_span_id
+            self.next_span_id += 1
+        parent_id = stack[-1] if stack else None
+        stack.append(span_id)
+        wall_start = time.time()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            self.observe(name, elapsed, **labels)
+            if self.tracing:
+                span = {
+                    "id": span_id,
+                    "parent_id": parent_id,
+                    "name": name,
+                    "labels": dict(labels),
+                    "start": wall_start,
+                    "duration_s": elapsed,
+                    "thread": threading.current_thread().name,
+                }
+                if error:
+                    span["error"] = error
+                with self.lock:
+                    self.spans.append(span)
+
+    def record_query(self, query_id, seconds, statement, rows=None):
+        """
+        Records a Snowflake statement's query ID and duration.
+
+        Args:
+            query_id (str): The Snowflake query ID.
+            seconds (float): Time from submission to result.
+            statement (str): The SQL text; only its first word is used as the statement kind.
+            rows (int, optional): Number of result rows. Defaults to None.
+        """
+        kind = statement.split(None, 1)[0].upper() if statement.strip() else ""
+        record = {
+            "query_id": query_id,
+            "kind": kind,
+            "duration_s": seconds,
+            "rows": rows,
+            "statement": " ".join(statement.split())[:200],
+        }
+        with self.lock:
+            self.queries.append(record)
+        self.observe("snowflake_query", seconds, kind=kind)
+
+    def snapshot(self):
+        """
+        Summarises everything recorded so far.
+
+        Returns:
+            dict: Counters, per-stage timing statistics, query records and spans.
+        """
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            timings = []
+            for (name, labels), samples in sorted(self.timings.items()):
+                ordered = sorted(samples)
+                timings.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": len(ordered),
+                    "sum_s": sum(ordered),
+                    "p50_s": _percentile(ordered, 0.50),
+                    "p90_s": _percentile(ordered, 0.90),
+                    "p99_s": _percentile(ordered, 0.99),
+                    "max_s": ordered[-1],
+                })
+            return {
+                "started_at": self.started_at,
+                "elapsed_s": time.time() - self.started_at,
+                "counters": counters,
+                "timings": timings,
+                "queries": list(self.queries),
+                "spans": list(self.spans),
+            }
+
+    def write_json_report(self, path):
+        """
+        Writes the run summary returned by snapshot() as a JSON file.
+
+        Args:
+            path (str): Destination file.
+        """
+        _write_atomically(path, json.dumps(self.snapshot(), indent=2, default=str))
+        logger.info(f"Wrote run metrics report to {path}")
+
+    def write_prometheus_textfile(self, path):
+        """
+        Writes counters and stage timings in the Prometheus text exposition format.
+
+        The file is intended for the node_exporter textfile collector: counters become
+        '<prefix>_<name>_total' and stage timings become summaries named
+        '<prefix>_<name>_seconds' with 0.5/0.9/0.99 quantiles.
+
+        Args:
+            path (str): Destination file; written atomically.
+        """
+        summary = self.snapshot()
+        lines = []
+        typed = set()
+        for counter in summary["counters"]:
+            metric = f"{METRIC_PREFIX}_{counter['name']}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(_label_key(counter['labels']))} {counter['value']}")
+        for timing in summary["timings"]:
+            metric = f"{METRIC_PREFIX}_{timing['name']}_seconds"
+            label_key = _label_key(timing["labels"])
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} summary")
+                typed.add(metric)
+            for quantile, field in (("0.5", "p50_s"), ("0.9", "p90_s"), ("0.99", "p99_s")):
+                lines.append(f"{metric}{_format_labels(label_key, [('quantile', quantile)])} {timing[field]}")
+            lines.append(f"{metric}_sum{_format_labels(label_key)} {timing['sum_s']}")
+            lines.append(f"{metric}_count{_format_labels(label_key)} {timing['count']}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_elapsed_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_elapsed_seconds {summary['elapsed_s']}")
+        _write_atomically(path, "\n".join(lines) + "\n")
+        logger.info(f"Wrote Prometheus metrics to {path}")
+
+    def write_trace(self, path):
+        """
+        Writes recorded spans in the Chrome trace event format (viewable in Perfetto).
+
+        Args:
+            path (str): Destination file.
+        """
+        with self.lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": span["name"],
+                "ph": "X",
+                "ts": (span["start"] - self.started_at) * 1e6,
+                "dur": span["duration_s"] * 1e6,
+                "pid": os.getpid(),
+                "tid": span["thread"],
+                "args": span["labels"],
+            }
+            for span in spans
+        ]
+        _write_atomically(path, json.dumps({"traceEvents": events}))
+
+def _write_atomically(path, text):
+    """
+    Writes text to path through a temporary file so readers never see a partial file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+class PendingQuery:
+    """
+    A Snowflake statement submitted with submit_query that may still be running.
+
+    Async jobs poll Snowflake for completion, so they only pay off when several statements
+    are in flight at once (e.g. setup DDL); single statements should use run_query. Several
+    pending queries can run on the same session at once; result() waits for one of them and
+    records its query ID and duration (from submission until the result was collected) in
+    the run metrics.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        query (str): The SQL statement to run.
+        params (list, optional): Bind parameters for the statement. Defaults to None.
+    """
+
+    def __init__(self, session, query, params=None):
+        self.query = query
+        self.started = time.perf_counter()
+        self.job = session.sql(query, params=params).collect_nowait()
+        self.rows = None  # Result rows, once collected
+
+    def result(self):
+        """
+        Waits for the statement to finish and returns its result rows.
+
+        Raises:
+            Exception: If the statement failed.
+        """
+        if self.rows is None:
+            self.rows = self.job.result()
+            metrics.record_query(
+                getattr(self.job, "query_id", None), time.perf_counter() - self.started, self.query,
+                len(self.rows) if isinstance(self.rows, list) else None
+            )
+        return self.rows
+
+def submit_query(session, query, params=None):
+    """
+    Submits a Snowflake statement without waiting for it to finish.
+
+    Independent statements submitted one after another run concurrently in Snowflake, so a
+    batch of them costs roughly one round trip instead of one per statement.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        query (str): The SQL statement to run.
+        params (list, optional): Bind parameters for the statement. Defaults to None.
+
+    Returns:
+        PendingQuery: Handle whose result() waits for the statement.
+    """
+    return PendingQuery(session, query, params)
+
+def run_query(session, query, params=None):
+    """
+    Runs a Snowflake statement and records its query ID and duration in the run metrics.
+
+    The statement is collected synchronously; its query ID is read from a query history
+    listener that records only the statements issued by the calling thread, so sessions
+    shared between threads attribute IDs correctly. Use submit_query for statements that
+    should run concurrently.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        query (str): The SQL statement to run.
+        params (list, optional): Bind parameters for the statement. Defaults to None.
+
+    Returns:
+        list: The result rows.
+    """
+    started = time.perf_counter()
+    thread_id = threading.get_ident()
+    with session.query_history(include_thread_id=True) as history:
+        rows = session.sql(query, params=params).collect()
+    # The last statement this thread sent is the query itself, after any describe calls
+    query_id = next(
+        (record.query_id for record in reversed(history.queries) if record.thread_id == thread_id), None
+    )
+    metrics.record_query(
+        query_id, time.perf_counter() - started, query, len(rows) if isinstance(rows, list) else None
+    )
+    return rows
+
+# Process-wide metrics for the current run
+metrics = RunMetrics()
@@ -0,0 +1,380 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from .config import logger, SECTION_CONCURRENCY, UPLOAD_QUEUE_SIZE, CHUNK_WORKERS
+from .metrics import metrics
+from .scraper import scrape_section, iter_text_for_section
+from .snowflake_utils import (
+    upload_navigation_data, upload_text_data, merge_navigation_data, merge_text_data,
+    plan_incremental_scrape, upload_failure_data, upload_section_mapping, upload_chunk_data,
+    replace_chunk_data, load_chunk_hashes, ChunkUploader, TextUploadSink
+)
+from .url_index import UrlIndex
+
+# Marker placed on the upload queue once every scrape worker has finished
+_STOP = object()
+
+def plan_stage(client, section, upload_queue, failed, url_index, incremental=False, checkpoint=None,
+               sitemap=None):
+    """
+    Runs the planning half of the scrape stage for a single section.
+
+    The navigation tree is scraped and handed to the upload stage straight away, so it can be
+    loaded while the section's text content is scraped later. Every URL the tree links to is
+    registered in the run-wide URL index, so pages can be assigned to sections once all of
+    them have been planned. Any exception is logged and recorded in `failed`, which stops the
+    remaining work for this section only.
+
+    In incremental mode the plan waits for the upload stage to compare the new navigation
+    tree with the stored one, and keeps only the pages it reports as new or changed.
+
+    With a checkpoint journal the fetched tree is journaled, and a resumed section continues
+    from the journal: finished sections are skipped, and journaled navigation is not fetched
+    or planned again.
+
+    With a refreshed sitemap index, pages whose sitemap lastmod changed are kept as well, even
+    when the navigation-tree decision above would skip them.
+
+    Args:
+        client (Spider): The Spider client instance for making HTTP requests.
+        section (dict): The section to process, with 'url' and 'basename' keys.
+        upload_queue (queue.Queue): Bounded queue feeding the upload stage.
+        failed (set): Names of sections that have failed, shared with the upload stage.
+        url_index (UrlIndex): Run-wide index deciding which section scrapes each URL.
+        incremental (bool, optional): Only scrape new or changed pages. Defaults to False.
+        checkpoint (CheckpointJournal, optional): Journal recording progress. Defaults to None.
+        sitemap (LastmodIndex, optional): Sitemap index deciding which listed pages changed.
+            Defaults to None.
+
+    Returns:
+        dict | None: The section's plan, with the navigation entries to scrape under
+            'tree_data' and its journaled state under 'resumed'; None if there is nothing
+            left to scrape.
+    """
+    url = section["url"]
+    section_name = section["basename"]
+    resumed = checkpoint.section_state(section_name) if checkpoint is not None else None
+    if resumed is not None and resumed['done']:
+        logger.info(f"Skipping section {section_name}: completed before the restart.")
+        return None
+    logger.info(f"Processing section: {section_name} ({url})")
+    try:
+        if resumed is not None and resumed['nav'] is not None:
+            tree_data = resumed['nav']
+            logger.info(f"Resuming section {section_name} with {len(tree_data)} journaled navigation entries.")
+        else:
+            with metrics.stage("nav_scrape", section=section_name):
+                tree_data = scrape_section(client, url, section_name)
+            if checkpoint is not None:
+                checkpoint.record_nav(section_name, tree_data)
+        metrics.incr("nav_entries", len(tree_data), section=section_name)
+        nav_entries = tree_data
+        # Ownership of shared pages depends on every section that links to them
+        url_index.register(nav_entries, section_name)
+        if resumed is not None and resumed['nav_uploaded']:
+            # Navigation was loaded before the restart; reuse the plan it produced
+            if resumed['pending'] is not None:
+                pending_urls = set(resumed['pending'])
+                tree_data = [entry for entry in tree_data if entry['url'] in pending_urls]
+        else:
+            # Blocks when the upload stage is behind, keeping memory bounded
+            planned = Future() if incremental else None
+            upload_queue.put(("nav", section, tree_data, planned))
+            if planned is not None:
+                # The upload stage answers with the entries that actually need scraping
+                tree_data = planned.result()
+                if section_name in failed:
+                    return None
+        if sitemap is not None:
+            # Pages whose lastmod changed are scraped on top of the plan
+            tree_data = sitemap.select(nav_entries, fallback=tree_data)
+            logger.info(
+                f"Sitemap selected {len(tree_data)} of {len(nav_entries)} pages to scrape in section={section_name}."
+            )
+        return {'tree_data': tree_data, 'resumed': resumed}
+    except Exception as e:
+        failed.add(section_name)
+        metrics.incr("sections_failed")
+        logger.error(f"Error processing {url}: {str(e)}")
+        return None
+
+def scrape_stage(client, section, plan, upload_queue, failed, url_index, checkpoint=None, sitemap=None,
+                 scheduler=None):
+    """
+    Runs the scraping half of the pipeline for a single, planned section.
+
+    Text content is streamed to the upload stage one batch at a time, followed by the pages
+    that could not be scraped. Any exception is logged and recorded in `failed`, which stops
+    the remaining work for this section only.
+
+    Only pages the section owns in the run-wide URL index are scraped: a page linked from
+    several sections is fetched and stored once, by the section that comes first in the
+    index's section order. Every section must have been planned before this runs.
+
+    With a checkpoint journal, the claimed URLs and every scraped batch are journaled, and
+    for a resumed section journaled rows that were never uploaded are re-queued instead of
+    being scraped again.
+
+    With a ScheduledSpider, the pages are scraped in its priority order: pages the sitemap
+    reports as changed first, then shallower pages before deeper ones.
+
+    Args:
+        client (Spider): The Spider client instance for making HTTP requests.
+        section (dict): The section to process, with 'url' and 'basename' keys.
+        plan (dict): The section's plan, as returned by plan_stage.
+        upload_queue (queue.Queue): Bounded queue feeding the upload stage.
+        failed (set): Names of sections that have failed, shared with the upload stage.
+        url_index (UrlIndex): Run-wide index deciding which section scrapes each URL.
+        checkpoint (CheckpointJournal, optional): Journal recording progress. Defaults to None.
+        sitemap (LastmodIndex, optional): Sitemap index deciding which listed pages changed.
+            Defaults to None.
+        scheduler (ScheduledSpider, optional): Request scheduler used by `client`, which
+            orders the section's pages. Defaults to None.
+    """
+    url = section["url"]
+    section_name = section["basename"]
+    tree_data, resumed = plan['tree_data'], plan['resumed']
+    try:
+        # Leave pages owned by another section to that section
+        tree_data = url_index.claim_entries(tree_data, section_name)
+        if checkpoint is not None:
+            checkpoint.record_claimed(section_name, [entry['url'] for entry in tree_data])
+        if resumed is not None:
+            # Upload rows scraped before the restart and skip every page that is already handled
+            if resumed['batches']:
+                upload_queue.put(("text", section, list(resumed['batches'].values()), None))
+            handled = resumed['committed'].union(resumed['batches'])
+            tree_data = [entry for entry in tree_data if entry['url'] not in handled]
+            logger.info(
+                f"Resuming section {section_name}: {len(resumed['committed'])} pages uploaded, "
+                f"{len(resumed['batches'])} scraped pages to upload, {len(tree_data)} pages left to scrape."
+            )
+
+        if scheduler is not None:
+            changed = set()
+            if sitemap is not None:
+                changed = {page_url for page_url, is_changed in sitemap.classify(
+                    [entry['url'] for entry in tree_data]
+                ).items() if is_changed}
+            tree_data = scheduler.prioritize(tree_data, changed)
+
+        # Stream each finished batch to the upload stage instead of collecting the whole section
+        failures = []
+        nav_by_url = {entry['url']: entry for entry in tree_data}
+        with metrics.stage("text_scrape", section=section_name):
+            for batch_rows in iter_text_for_section(client, tree_data, failures=failures):
+                # Stop scraping if an upload for this section already failed
+                if section_name in failed:
+                    return
+                # Carry each page's place in the navigation through to its chunks
+                for row in batch_rows:
+                    entry = nav_by_url.get(row['url'], {})
+                    row['depth'] = entry.get('depth')
+                    row['parent_url'] = entry.get('parent_url')
+                if checkpoint is not None:
+                    checkpoint.record_batch(section_name, batch_rows)
+                upload_queue.put(("text", section, batch_rows, None))
+        upload_queue.put(("text_done", section, failures, None))
+    except Exception as e:
+        failed.add(section_name)
+        metrics.incr("sections_failed")
+        logger.error(f"Error processing {url}: {str(e)}")
+
+def upload_stage(session, upload_queue, failed, incremental=False, checkpoint=None, chunker=None,
+                 deduper=None, sitemap=None):
+    """
+    Runs the upload half of the pipeline, consuming scraped data from the upload queue.
+
+    Each upload thread writes with a Snowpark session of its own, so a session is never
+    shared between threads, and a section's items always go to the same upload thread, so
+    they are applied in order. Text batches go through a per-section TextUploadSink, which writes them
+    in bounded chunks. Items belonging to a section that has already failed are discarded.
+
+    Navigation items also refresh the section's rows in the URL-to-section mapping table.
+    In incremental mode navigation data is diffed against the stored tree and merged, the
+    pages to scrape are reported back through the item's Future, and text is merged too.
+    With a checkpoint journal, navigation uploads, committed text chunks and finished sections
+    are journaled once they are written. With a ChunkUploader, uploaded text is also split into
+    retrieval chunks for ONLINE_RESOURCES_CHUNKS. With a NearDuplicateDetector, text is checked
+    for near-duplicate pages and boilerplate before it is stored. With a LastmodIndex, the
+    sitemap lastmod of every stored page is committed.
+
+    Args:
+        session (Session): A Snowpark Session object owned by this upload thread.
+        upload_queue (queue.Queue): Bounded queue fed by the scrape stage.
+        failed (set): Names of sections that have failed, shared with the scrape stage.
+        incremental (bool, optional): Merge changes instead of appending. Defaults to False.
+        checkpoint (CheckpointJournal, optional): Journal recording progress. Defaults to None.
+        chunker (ChunkUploader, optional): Chunks and uploads the text content. Defaults to None.
+        deduper (NearDuplicateDetector, optional): Run-wide near-duplicate detector. Defaults to None.
+        sitemap (LastmodIndex, optional): Sitemap index recording stored pages. Defaults to None.
+    """
+    upload_text = merge_text_data if incremental else upload_text_data
+    sinks = {}  # Open text sinks, keyed by section name
+    while True:
+        item = upload_queue.get()
+        if item is _STOP:
+            return
+        kind, section, rows, planned = item
+        url = section["url"]
+        section_name = section["basename"]
+        # Drop work for sections that have already failed in another stage
+        if section_name in failed:
+            continue
+        try:
+            if kind == "nav" and planned is not None:
+                # Diff against the stored tree before the merge overwrites it
+                with metrics.stage("nav_upload", section=section_name):
+                    pending = plan_incremental_scrape(session, rows, section_name)
+                    merge_navigation_data(session, rows, section_name)
+                    upload_section_mapping(session, rows, section_name)
+                if checkpoint is not None:
+                    checkpoint.record_nav_uploaded(section_name, pending)
+                planned.set_result(pending)
+            elif kind == "nav":
+                with metrics.stage("nav_upload", section=section_name):
+                    upload_navigation_data(session, rows, section_name)
+                    upload_section_mapping(session, rows, section_name)
+                if checkpoint is not None:
+                    checkpoint.record_nav_uploaded(section_name)
+            elif kind == "text":
+                if section_name not in sinks:
+                    sinks[section_name] = TextUploadSink(
+                        session, section_name, upload=upload_text, checkpoint=checkpoint, chunker=chunker,
+                        deduper=deduper, sitemap=sitemap
+                    )
+                sinks[section_name].add(rows)
+            else:
+                # Flush whatever is still buffered for the section, then report failed pages
+                sink = sinks.pop(section_name, None)
+                if sink is not None:
+                    sink.close()
+                upload_failure_data(session, rows, section_name)
+                if checkpoint is not None:
+                    checkpoint.record_section_done(section_name)
+                metrics.incr("sections_completed")
+                logger.info(f"Completed processing {url} (section={section_name})")
+        except Exception as e:
+            sinks.pop(section_name, None)
+            failed.add(section_name)
+            metrics.incr("sections_failed")
+            logger.error(f"Error processing {url}: {str(e)}")
+            # Release a scrape worker waiting on the incremental plan
+            if planned is not None and not planned.done():
+                planned.set_result([])
+
+def run_pipeline(session, client, sections, max_parallel_sections=SECTION_CONCURRENCY,
+                 queue_size=UPLOAD_QUEUE_SIZE, incremental=False, url_index=None, checkpoint=None,
+                 chunk_workers=CHUNK_WORKERS, deduper=None, session_pool=None, sitemap=None, scheduler=None):
+    """
+    Scrapes and uploads several documentation sections as an overlapping pipeline.
+
+    Up to `max_parallel_sections` sections are scraped at the same time, while upload threads
+    load finished navigation and text data into Snowflake: one thread per session of
+    `session_pool`, or a single thread on `session` without a pool. Sections are assigned to
+    upload threads in turn, so different sections' loads run at the same time. Each upload
+    thread is fed by its own bounded queue, so uploads overlap with scraping without letting
+    scraped data pile up in memory. A failure in one section is logged
+    and does not affect the others. In incremental mode only new or changed pages are scraped
+    and all changes are applied with MERGE. Every section shares one URL index, so a page
+    linked from several sections is scraped and stored only once, by the first of them in
+    `sections` order; text scraping starts once every section's navigation has been planned. Uploaded text is split into
+    retrieval chunks by a pool of `chunk_workers` processes; only pages whose content changed
+    since their chunks were last stored are chunked again. With a refreshed sitemap index, pages
+    whose sitemap lastmod changed are scraped in addition to those the incremental plan chooses.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake, used for run-wide
+            queries and, without a pool, for every upload.
+        client (Spider): The Spider client instance for making HTTP requests.
+        sections (list): Sections to process, each a dict with 'url' and 'basename' keys.
+        max_parallel_sections (int, optional): Maximum number of sections scraped concurrently.
+            Defaults to SECTION_CONCURRENCY.
+        queue_size (int, optional): Maximum number of scraped items waiting for upload.
+            Defaults to UPLOAD_QUEUE_SIZE.
+        incremental (bool, optional): Run an incremental crawl. Defaults to False.
+        url_index (UrlIndex, optional): Run-wide URL index shared by all sections. A new
+            index ranking sections in `sections` order is created when omitted.
+        checkpoint (CheckpointJournal, optional): Journal recording progress, and holding the
+            progress of an interrupted run when resuming. Defaults to None.
+        chunk_workers (int, optional): Processes used for chunking; 0 disables chunking.
+            Defaults to CHUNK_WORKERS.
+        deduper (NearDuplicateDetector, optional): Flags or collapses near-duplicate pages and
+            boilerplate across all sections. Defaults to None (no detection).
+        session_pool (SessionPool, optional): Sessions to upload with, one upload thread each.
+            Defaults to None (upload on `session` only).
+        sitemap (LastmodIndex, optional): Refreshed sitemap index used to discover changed
+            pages; requires an incremental run. Defaults to None (navigation trees only).
+        scheduler (ScheduledSpider, optional): Request scheduler used by `client`; every
+            section's pages are then scraped in its priority order. Defaults to None.
+
+    Returns:
+        set: The names of the sections that failed.
+
+    Raises:
+        ValueError: If a sitemap index is given for a full run, which would replace the stored
+            content of every page the sitemap reports as unchanged.
+    """
+    if sitemap is not None and not incremental:
+        raise ValueError("Sitemap discovery requires an incremental run.")
+    url_index = url_index if url_index is not None else UrlIndex([section["basename"] for section in sections])
+    if checkpoint is not None:
+        # Pages claimed before a restart stay with the section that claimed them
+        for section_name, urls in checkpoint.claims().items():
+            url_index.restore(section_name, urls)
+    upload_sessions = list(session_pool) if session_pool is not None else [session]
+    upload_queues = [queue.Queue(maxsize=queue_size) for _ in upload_sessions]
+    failed = set()
+    chunk_pool = None
+    chunker = None
+    if chunk_workers > 0:
+        # Spawned workers don't inherit the scrape threads or the Snowflake connection
+        chunk_pool = ProcessPoolExecutor(max_workers=chunk_workers, mp_context=multiprocessing.get_context("spawn"))
+        # Runs that keep existing tables replace a page's chunks and skip pages that haven't changed
+        keep_existing = incremental or (checkpoint is not None and checkpoint.resumed)
+        chunker = ChunkUploader(
+            chunk_pool, chunk_workers,
+            upload=replace_chunk_data if keep_existing else upload_chunk_data,
+            known_hashes=load_chunk_hashes(session) if keep_existing else None
+        )
+    # Start one upload consumer per session before any scraping begins
+    uploaders = [
+        threading.Thread(
+            target=upload_stage,
+            args=(upload_session, upload_queue, failed, incremental, checkpoint, chunker, deduper, sitemap),
+            name=f"upload-stage-{index}"
+        )
+        for index, (upload_session, upload_queue) in enumerate(zip(upload_sessions, upload_queues))
+    ]
+    for uploader in uploaders:
+        uploader.start()
+    try:
+        # Scrape sections in parallel; leaving the block waits for every worker to finish
+        with ThreadPoolExecutor(max_workers=max_parallel_sections, thread_name_prefix="scrape-stage") as pool:
+            # A section always uploads through the same thread, keeping its items in order
+            section_queues = [
+                (section, upload_queues[index % len(upload_queues)]) for index, section in enumerate(sections)
+            ]
+            plans = [
+                pool.submit(
+                    plan_stage, client, section, upload_queue, failed, url_index, incremental, checkpoint, sitemap
+                )
+                for section, upload_queue in section_queues
+            ]
+            # Pages shared by several sections can only be assigned once every section's links are known
+            for (section, upload_queue), plan in zip(section_queues, plans):
+                if plan.result() is not None:
+                    pool.submit(
+                        scrape_stage, client, section, plan.result(), upload_queue, failed, url_index, checkpoint,
+                        sitemap, scheduler
+                    )
+    finally:
+        # Let the uploaders drain what is left on their queues and exit
+        for upload_queue in upload_queues:
+            upload_queue.put(_STOP)
+        for uploader in uploaders:
+            uploader.join()
+        if chunk_pool is not None:
+            chunk_pool.shutdown()
+    return failed
@@ -0,0 +1,117 @@
+import random
+from .config import (
+    logger, RETRY_BASE_DELAY, RETRY_MAX_DELAY, BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN,
+    BATCH_TARGET_LATENCY
+)
+from .metrics import metrics
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """
+    Computes a jittered exponential backoff delay for a retry.
+
+    The delay doubles with each attempt up to max_delay, and the second half of it is
+    randomised so URLs that failed together don't all retry at the same instant.
+
+    Args:
+        attempt (int): The number of failed attempts so far (1 for the first retry).
+        base (float, optional): Delay in seconds for the first retry. Defaults to RETRY_BASE_DELAY.
+        max_delay (float, optional): Upper bound on the delay in seconds. Defaults to RETRY_MAX_DELAY.
+
+    Returns:
+        float: The number of seconds to wait before retrying.
+    """
+    delay = min(max_delay, base * (2 ** max(0, attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an endpoint after repeated failures, then probes it again.
+
+    The breaker opens after failure_threshold consecutive failed requests and stays open for
+    cooldown seconds. It then lets a single probe request through (half-open): a success closes
+    the breaker, a failure opens it for another cooldown period. Times are taken from the
+    caller, typically the event loop clock.
+
+    Args:
+        failure_threshold (int, optional): Consecutive failures that open the breaker.
+            Defaults to BREAKER_FAILURE_THRESHOLD.
+        cooldown (float, optional): Seconds the breaker stays open. Defaults to BREAKER_COOLDOWN.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = None  # Time at which an open breaker allows a probe, None when closed
+        self.probe_in_flight = False
+
+    def allow_request(self, now):
+        """
+        Returns True if a request may be sent at time `now`.
+        """
+        if self.open_until is None:
+            return True
+        if now < self.open_until or self.probe_in_flight:
+            return False
+        # Half-open: let exactly one probe through
+        self.probe_in_flight = True
+        return True
+
+    def record(self, success, now):
+        """
+        Records the outcome of a request sent through the breaker.
+
+        Args:
+            success (bool): Whether the request succeeded.
+            now (float): The current time.
+        """
+        self.probe_in_flight = False
+        if success:
+            if self.open_until is not None:
+                logger.info("Circuit breaker closed: Spider endpoint is responding again.")
+            self.consecutive_failures = 0
+            self.open_until = None
+            return
+        self.consecutive_failures += 1
+        if self.open_until is not None or self.consecutive_failures >= self.failure_threshold:
+            if self.open_until is None:
+                metrics.incr("circuit_breaker_opened")
+                logger.warning(
+                    f"Circuit breaker opened after {self.consecutive_failures} consecutive failed batches; "
+                    f"pausing requests for {self.cooldown:.0f}s."
+                )
+            self.open_until = now + self.cooldown
+
+class AdaptiveBatchSizer:
+    """
+    Adjusts the number of URLs per batch from observed latency and error rate.
+
+    Batches that are slow or mostly fail halve the batch size; fast, clean batches grow it by
+    roughly 10%, up to max_size (additive increase, multiplicative decrease).
+
+    Args:
+        initial (int): Starting batch size.
+        min_size (int, optional): Smallest batch size. Defaults to 1.
+        max_size (int, optional): Largest batch size. Defaults to `initial`.
+        target_latency (float, optional): Batch latency in seconds above which the size is reduced.
+            Defaults to BATCH_TARGET_LATENCY.
+    """
+
+    def __init__(self, initial, min_size=1, max_size=None, target_latency=BATCH_TARGET_LATENCY):
+        self.batch_size = initial
+        self.min_size = min_size
+        self.max_size = max_size or initial
+        self.target_latency = target_latency
+
+    def record(self, latency, error_rate):
+        """
+        Updates the batch size after a batch completes.
+
+        Args:
+            latency (float): Seconds the batch took.
+            error_rate (float): Fraction of the batch's URLs that failed (0.0 to 1.0).
+        """
+        if error_rate > 0.5 or latency > self.target_latency:
+            self.batch_size = max(self.min_size, self.batch_size // 2)
+        elif error_rate == 0 and latency < self.target_latency / 2:
+            self.batch_size = min(self.max_size, self.batch_size + max(1, self.batch_size // 10))
@@ -0,0 +1,374 @@
+import copy
+import heapq
+import inspect
+import itertools
+import re
+import threading
+import time
+import types
+from collections import deque
+from .config import (
+    logger, SPIDER_RATE_LIMIT, SPIDER_MIN_RATE, SPIDER_BURST, SPIDER_MAX_IN_FLIGHT, SPIDER_CREDIT_BUDGET,
+    SPIDER_COST_PER_PAGE, SCHEDULER_STATS_INTERVAL
+)
+from .metrics import metrics
+
+# Spider client errors report the HTTP status in their message
+THROTTLED_ERROR = re.compile(r'Status code: 429\b')
+# Seconds of completed requests used to compute the live throughput
+THROUGHPUT_WINDOW = 60.0
+# Priority of requests for URLs that were never prioritised, such as section landing pages
+UNRANKED_PRIORITY = (-1, 0)
+
+def _accepts_stream(client):
+    """
+    Returns True if a synchronous client's scrape_url takes a `stream` argument.
+    """
+    scrape_url = getattr(client, 'scrape_url', None)
+    if scrape_url is None:
+        return False
+    try:
+        return 'stream' in inspect.signature(scrape_url).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _single_attempt_client(client):
+    """
+    Returns a client that sends each request once instead of retrying it internally.
+
+    The Spider SDK wraps api_post in a tenacity retry (5 attempts, 1-60s exponential waits),
+    which hides HTTP 429 responses from the scheduler and multiplies every admitted request.
+    A shallow copy of the client gets the undecorated method, so the caller's client keeps
+    its retries; retries are left to the scraper. Clients without a decorated api_post are
+    returned as they are.
+    """
+    api_post = getattr(type(client), 'api_post', None)
+    unwrapped = getattr(api_post, '__wrapped__', None)
+    if unwrapped is None or not hasattr(api_post, 'retry_with'):
+        return client
+    single = copy.copy(client)
+    single.api_post = types.MethodType(unwrapped, single)
+    return single
+
+class CreditBudgetExceeded(RuntimeError):
+    """
+    Raised instead of sending a request that the remaining credit budget cannot cover.
+    """
+
+class TokenBucket:
+    """
+    Token bucket limiting how many requests start per second.
+
+    Tokens are added at `rate` per second up to `burst`; each request takes one. Times are
+    taken from the caller, typically time.monotonic().
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Maximum number of stored tokens.
+        now (float): The current time.
+    """
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """
+        Returns the seconds until a token is available (0 if one is available now).
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """
+        Takes one token; call only when wait_time() returned 0.
+        """
+        self._refill(now)
+        self.tokens -= 1
+
+class ScheduledSpider:
+    """
+    Wraps a Spider client with rate limiting, a global concurrency limit, a credit budget and
+    priority ordering of requests.
+
+    Every scrape_url call waits for an admission slot. A request starts only when a token
+    bucket allows it, fewer than `max_in_flight` requests are running across the whole run,
+    and the credit budget can cover its estimated cost. Waiting requests are admitted in
+    priority order: section landing pages first, then pages marked as changed, then pages
+    by navigation depth, shallowest first (see prioritize). A batch takes the priority of
+    its most urgent URL.
+
+    The request rate adapts to the provider (additive increase, multiplicative decrease):
+    a throttled request (HTTP 429) halves the rate, down to min_rate, and every successful
+    request raises it by 10% of `rate`, up to `rate`. This keeps throughput close to the
+    highest sustainable level instead of running into throttling and retries.
+
+    Costs are read from each result's 'costs.total_cost' when Spider reports it, and are
+    otherwise estimated from the average cost per page seen so far (cost_per_page until a
+    cost has been reported). A request's estimated cost is reserved when it is admitted, so
+    concurrent requests can't overspend. A request the remaining budget can't cover waits
+    while other requests are in flight, since their actual costs may come in below their
+    reservations; only when nothing is in flight and the budget still can't cover it is
+    CreditBudgetExceeded raised instead of sending it.
+
+    Requests are sent through a copy of the client with its own retries turned off, so every
+    admitted request is sent exactly once and throttling is seen as soon as it happens; the
+    scraper retries failed batches and navigation fetches through the scheduler.
+
+    Live statistics are available from stats(), logged every `stats_interval` seconds, and
+    recorded in the run metrics. The wrapper is safe to share between threads; cache hits
+    should be served before it (wrap it in CachedSpider) so they cost nothing.
+
+    Args:
+        client (Spider): The client that sends the requests.
+        rate (float, optional): Maximum requests started per second. Defaults to SPIDER_RATE_LIMIT.
+        burst (int, optional): Requests that may start back to back. Defaults to SPIDER_BURST.
+        max_in_flight (int, optional): Requests running at once. Defaults to SPIDER_MAX_IN_FLIGHT.
+        budget (float, optional): Total cost the run may spend; 0 or less is unlimited.
+            Defaults to SPIDER_CREDIT_BUDGET.
+        cost_per_page (float, optional): Estimated cost of a page before any cost is reported.
+            Defaults to SPIDER_COST_PER_PAGE.
+        min_rate (float, optional): Lowest rate reached by backing off. Defaults to SPIDER_MIN_RATE.
+        stats_interval (float, optional): Seconds between progress logs; 0 disables them.
+            Defaults to SCHEDULER_STATS_INTERVAL.
+    """
+
+    def __init__(self, client, rate=SPIDER_RATE_LIMIT, burst=SPIDER_BURST, max_in_flight=SPIDER_MAX_IN_FLIGHT,
+                 budget=SPIDER_CREDIT_BUDGET, cost_per_page=SPIDER_COST_PER_PAGE, min_rate=SPIDER_MIN_RATE,
+                 stats_interval=SCHEDULER_STATS_INTERVAL):
+        # A 429 must reach the scheduler on the first response to slow the request rate down
+        self.client = _single_attempt_client(client)
+        # scrape_url(stream=True) only works when the wrapped client can stream
+        self.supports_streaming = _accepts_stream(client)
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_in_flight = max(1, max_in_flight)
+        self.budget = budget if budget > 0 else None
+        self.default_cost_per_page = cost_per_page
+        self.stats_interval = stats_interval
+        self.condition = threading.Condition()
+        now = time.monotonic()
+        self.bucket = TokenBucket(rate, burst, now)
+        self.started_at = now
+        self.last_logged = now
+        self.waiting = []  # Heap of (priority, seq) tickets of requests waiting for admission
+        self.seq = itertools.count()  # Tie-breaker keeping equal priorities first come, first served
+        self.priorities = {}  # URL -> priority set by prioritize()
+        self.in_flight = 0
+        self.reserved = 0.0  # Estimated cost of the requests in flight
+        self.spent = 0.0  # Cost of the completed requests
+        self.reported_cost = 0.0  # Part of `spent` that Spider reported, and the pages it covered
+        self.reported_pages = 0
+        self.requests = 0
+        self.pages = 0
+        self.throttled = 0
+        self.completed = deque()  # (finished_at, pages) of recent requests, for the throughput
+
+    def prioritize(self, entries, changed=()):
+        """
+        Records the priority of a section's pages and returns the entries in priority order.
+
+        Pages in `changed` come first, then pages by navigation depth, shallowest first.
+        Scraping the entries in the returned order puts the most urgent pages in the first
+        batches, and the recorded priorities order those batches against other sections'.
+
+        Args:
+            entries (list): Navigation entries with 'url' and 'depth' keys.
+            changed (set, optional): URLs of recently changed pages. Defaults to none.
+
+        Returns:
+            list: The entries, sorted by priority (stable for equal priorities).
+        """
+        ranked = [(0 if entry['url'] in changed else 1, entry.get('depth') or 0) for entry in entries]
+        with self.condition:
+            for entry, priority in zip(entries, ranked):
+                self.priorities[entry['url']] = priority
+        order = sorted(range(len(entries)), key=ranked.__getitem__)
+        return [entries[i] for i in order]
+
+    def _cost_per_page(self):
+        """
+        Returns the average reported cost per page, or the configured estimate. Lock held.
+        """
+        if self.reported_pages:
+            return self.reported_cost / self.reported_pages
+        return self.default_cost_per_page
+
+    def _remaining(self):
+        """
+        Returns the budget not yet spent or reserved, or None when unlimited. Lock held.
+        """
+        return None if self.budget is None else self.budget - self.spent - self.reserved
+
+    def _admit(self, priority, url_count):
+        """
+        Blocks until a request may start, then reserves its slot and estimated cost.
+
+        Returns:
+            float: The reserved estimated cost, to be released by _finish().
+
+        Raises:
+            CreditBudgetExceeded: If the remaining budget can't cover the request once no other
+                request is in flight.
+        """
+        ticket = (priority, next(self.seq))
+        waited = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    # Re-estimated on every wake-up, as finished requests refine the cost per page
+                    estimate = url_count * self._cost_per_page()
+                    remaining = self._remaining()
+                    if remaining is not None and estimate > remaining:
+                        if self.in_flight:
+                            # Running requests may settle below their reservations; woken by _finish
+                            self.condition.wait()
+                            continue
+                        metrics.incr("spider_budget_refusals")
+                        raise CreditBudgetExceeded(
+                            f"Credit budget exhausted: {self.spent:.4f} of {self.budget:.4f} spent, "
+                            f"{url_count} page(s) need about {estimate:.4f}."
+                        )
+                    if self.waiting[0] == ticket and self.in_flight < self.max_in_flight:
+                        delay = self.bucket.wait_time(time.monotonic())
+                        if delay <= 0:
+                            break
+                        self.condition.wait(delay)
+                    else:
+                        # Woken when a request finishes or the head of the queue is admitted
+                        self.condition.wait()
+            except BaseException:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+                raise
+            heapq.heappop(self.waiting)
+            self.bucket.take(time.monotonic())
+            self.in_flight += 1
+            self.reserved += estimate
+            # The next waiter may be admissible as well
+            self.condition.notify_all()
+        metrics.observe("spider_admission_wait", time.monotonic() - waited)
+        return estimate
+
+    def _finish(self, estimate, cost, reported_pages, pages, throttled):
+        """
+        Releases a finished request's slot and reservation, and adapts the request rate.
+        """
+        now = time.monotonic()
+        with self.condition:
+            self.in_flight -= 1
+            self.reserved -= estimate
+            self.spent += cost
+            self.reported_pages += reported_pages
+            self.reported_cost += cost if reported_pages else 0.0
+            self.requests += 1
+            self.pages += pages
+            self.completed.append((now, pages))
+            if throttled:
+                self.throttled += 1
+                self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+                logger.warning(f"Spider throttled the request; lowering the request rate to {self.bucket.rate:.2f}/s.")
+            else:
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate / 10)
+            self.condition.notify_all()
+            log_now = self.stats_interval > 0 and now - self.last_logged >= self.stats_interval
+            if log_now:
+                self.last_logged = now
+        metrics.incr("spider_cost", cost)
+        if throttled:
+            metrics.incr("spider_throttled")
+        if log_now:
+            self.log_stats()
+
+    def scrape_url(self, url, params=None, stream=False):
+        """
+        Scrapes one URL or a comma-separated batch of URLs once the scheduler admits it.
+
+        Args:
+            url (str): A URL or a comma-separated list of URLs.
+            params (dict, optional): Parameters to pass to the wrapped client's scrape_url method.
+            stream (bool, optional): Return the raw HTTP response; requires a streaming client.
+                Its cost is estimated, since the body is not read here. Defaults to False.
+
+        Returns:
+            list | requests.Response: The wrapped client's response.
+
+        Raises:
+            CreditBudgetExceeded: If the remaining budget can't cover the request.
+        """
+        urls = url.split(',')
+        with self.condition:
+            priority = min(self.priorities.get(u, UNRANKED_PRIORITY) for u in urls)
+        estimate = self._admit(priority, len(urls))
+        cost, reported_pages, pages, throttled = estimate, 0, 0, False
+        try:
+            if stream:
+                response = self.client.scrape_url(url, params=params, stream=True)
+                throttled = getattr(response, 'status_code', None) == 429
+                return response
+            results = self.client.scrape_url(url, params=params) or []
+            reported = 0.0
+            for res in results if isinstance(results, list) else []:
+                costs = res.get('costs')
+                if isinstance(costs, dict) and costs.get('total_cost') is not None:
+                    reported += float(costs['total_cost'])
+                    reported_pages += 1
+                throttled = throttled or res.get('status') == 429
+                pages += res.get('status') == 200 and not res.get('error')
+            if reported_pages:
+                # Pages without a reported cost are charged the average of those with one
+                cost = reported + (len(results) - reported_pages) * reported / reported_pages
+            return results
+        except Exception as e:
+            throttled = bool(THROTTLED_ERROR.search(str(e)))
+            raise
+        finally:
+            self._finish(estimate, cost, reported_pages, pages, throttled)
+
+    def stats(self):
+        """
+        Returns live scheduler statistics.
+
+        Returns:
+            dict: Requests and pages completed, pages per second over the last minute, the
+                current request rate, requests in flight and waiting, throttled requests,
+                cost spent and remaining budget (None when unlimited).
+        """
+        now = time.monotonic()
+        with self.condition:
+            while self.completed and now - self.completed[0][0] > THROUGHPUT_WINDOW:
+                self.completed.popleft()
+            window = min(THROUGHPUT_WINDOW, now - self.started_at) or 1.0
+            remaining = self._remaining()
+            return {
+                'requests': self.requests,
+                'pages': self.pages,
+                'pages_per_second': round(sum(pages for _, pages in self.completed) / window, 3),
+                'rate': round(self.bucket.rate, 3),
+                'in_flight': self.in_flight,
+                'waiting': len(self.waiting),
+                'throttled': self.throttled,
+                'cost_spent': round(self.spent, 6),
+                'budget_remaining': None if remaining is None else round(remaining, 6),
+            }
+
+    def log_stats(self):
+        """
+        Logs the current scheduler statistics.
+        """
+        stats = self.stats()
+        budget = "unlimited" if stats['budget_remaining'] is None else f"{stats['budget_remaining']:.4f}"
+        logger.info(
+            f"Spider scheduler: {stats['pages']} pages in {stats['requests']} requests, "
+            f"{stats['pages_per_second']} pages/s, rate {stats['rate']}/s, {stats['in_flight']} in flight, "
+            f"{stats['waiting']} waiting, {stats['throttled']} throttled, cost {stats['cost_spent']:.4f}, "
+            f"budget remaining {budget}."
+        )
@@ -1,4 +1,51 @@
-from .config import BASE_URL, logger
+import asyncio
+import heapq
+import inspect
+import itertools
+import re
+import time
+import ijson
+import requests
+from collections import defaultdict, deque
+from .config import BASE_URL, SCRAPE_CONCURRENCY, NAV_FETCH_ATTEMPTS, logger
+from .metrics import metrics
+from .retry import AdaptiveBatchSizer, CircuitBreaker, backoff_delay
+from .scheduler import CreditBudgetExceeded
+
+# Client errors that concern the whole endpoint rather than the URLs in a batch
+ENDPOINT_ERROR = re.compile(r'Status code: (401|402|403|429|5\d\d)\b')
+# Client errors that are worth retrying: throttling and server errors
+TRANSIENT_ERROR = re.compile(r'Status code: (429|5\d\d)\b')
+
+# Spider return_format of page content; stored with each page so older formats can be replaced
+TEXT_FORMAT = 'markdown'
+
+# Fields a tree node must have to be a navigation entry
+NAV_NODE_FIELDS = ('id', 'href', 'label', 'type', 'depth', 'parentRef')
+# Location of the navigation tree inside a Spider response (list indexes and object keys)
+NAV_TREE_PATH = (0, 'json_data', 'other_scripts', 0, 'props', 'pageProps', 'tree')
+
+# Minimal Spider parameters for a navigation fetch: only the page's JSON data is needed
+NAV_ONLY_PARAMS = {
+    'proxy_enabled': True,  # Use a proxy for the request
+    'store_data': False,  # Do not store raw data on the Spider server
+    'request': 'http',  # Plain HTTP fetch; the tree is embedded in the page, no browser needed
+    'metadata': False,  # Skip page metadata
+    'return_page_links': False,  # Skip links found on the page
+    'return_json_data': True,  # Include JSON data in the response (holds the tree)
+    'readability': False,  # Skip readability parsing of the landing page
+    'return_format': 'text'  # Smallest supported content format
+}
+# Full-page parameters, for callers that also want the landing page's content
+FULL_NAV_PARAMS = {
+    'proxy_enabled': True,  # Use a proxy for the request
+    'store_data': False,  # Do not store raw data on the Spider server
+    'metadata': True,  # Include metadata in the response
+    'return_page_links': True,  # Include links found on the page
+    'return_json_data': True,  # Include JSON data in the response
+    'readability': True,  # Use readability parsing to extract clean content
+    'return_format': 'text'  # Return the content as text
+}
 
 def resolve_url(href, base_url=BASE_URL):
     """
@@ -18,13 +65,155 @@ def resolve_url(href, base_url=BASE_URL):
         return href
     return base_url + href
 
+def _make_nav_entry(node, base_url=BASE_URL):
+    """
+    Builds a navigation entry from a tree node, or returns None if the node is incomplete.
+
+    Args:
+        node (dict): A node from the navigation tree.
+        base_url (str, optional): The base URL to resolve relative hrefs. Defaults to BASE_URL.
+
+    Returns:
+        dict | None: {'id', 'url', 'label', 'type', 'depth', 'parent_url'}, or None.
+    """
+    # Check if the node has all required fields to be a valid navigation entry
+    if not all(key in node for key in NAV_NODE_FIELDS):
+        return None
+    # Create an entry with the node's data, resolving URLs as needed
+    return {
+        'id': node['id'],
+        'url': resolve_url(node['href'], base_url),  # Resolve the href to a full URL
+        'label': node['label'],
+        'type': node['type'],
+        'depth': node['depth'],
+        'parent_url': resolve_url(node['parentRef'], base_url)  # Resolve the parent reference
+    }
+
+def iter_tree_entries(tree_data, base_url=BASE_URL, dedupe=False):
+    """
+    Yields navigation entries from a parsed 'tree' structure, without recursion.
+
+    The tree is walked depth-first in document order (a node before its children) using an
+    explicit stack, so arbitrarily deep trees never hit Python's recursion limit.
+
+    Args:
+        tree_data (dict): The 'tree' object from the JSON response, typically containing a 'children' key.
+        base_url (str, optional): The base URL to resolve relative hrefs. Defaults to BASE_URL.
+        dedupe (bool, optional): Skip entries whose URL was already yielded. Defaults to False.
+
+    Yields:
+        dict: Navigation entries: {'id', 'url', 'label', 'type', 'depth', 'parent_url'}.
+    """
+    seen_urls = set()
+    children = tree_data.get('children') if isinstance(tree_data, dict) else None
+    # Children are pushed in reverse so they are popped in document order
+    stack = list(reversed(children)) if isinstance(children, list) else []
+    while stack:
+        node = stack.pop()
+        # Skip if node is not a dictionary (e.g., None or unexpected type)
+        if not isinstance(node, dict):
+            continue
+        entry = _make_nav_entry(node, base_url)
+        if entry is not None and not (dedupe and entry['url'] in seen_urls):
+            seen_urls.add(entry['url'])
+            yield entry
+        if isinstance(node.get('children'), list):
+            stack.extend(reversed(node['children']))
+
+def iter_tree_entries_from_json(stream, base_url=BASE_URL, dedupe=False):
+    """
+    Yields navigation entries straight from a raw Spider JSON response, without parsing it whole.
+
+    The response bytes are read incrementally with ijson's low-level event parser. Only a small
+    frame per open JSON container and the scalar fields of the nodes currently being read are
+    kept, so memory is bounded by the depth of the tree rather than its size, and there is no
+    recursion. Only the tree in the first result's first 'other_scripts' entry is read, as in
+    scrape_navigation, and reading stops as soon as that tree ends. A node is yielded as soon
+    as its fields are known, so entries normally come out in document order.
+
+    Args:
+        stream (file-like): Binary stream containing the JSON response (a list of results).
+        base_url (str, optional): The base URL to resolve relative hrefs. Defaults to BASE_URL.
+        dedupe (bool, optional): Skip entries whose URL was already yielded. Defaults to False.
+
+    Yields:
+        dict: Navigation entries: {'id', 'url', 'label', 'type', 'depth', 'parent_url'}.
+    """
+    seen_urls = set()
+    # One frame per open container: [is_array, role, current key or next index, data]
+    # Roles: 'path' (data = steps of NAV_TREE_PATH matched), 'tree', 'children',
+    # 'node' (data = [fields, emitted]) and 'skip' for everything else
+    frames = []
+
+    def take_entry(node_data):
+        # Mark a node as emitted and return its entry, or None if it is incomplete or a duplicate
+        node_data[1] = True
+        entry = _make_nav_entry(node_data[0], base_url)
+        if entry is None or (dedupe and entry['url'] in seen_urls):
+            return None
+        seen_urls.add(entry['url'])
+        return entry
+
+    for event, value in ijson.basic_parse(stream, use_float=True):
+        if event == 'map_key':
+            frames[-1][2] = value
+            continue
+        if event in ('end_map', 'end_array'):
+            is_array, role, _, data = frames.pop()
+            if role == 'node' and not data[1]:
+                entry = take_entry(data)
+                if entry is not None:
+                    yield entry
+            elif role == 'tree':
+                return  # Nothing after the tree is needed
+            continue
+        # A value starts: work out where it sits in its parent container
+        if frames:
+            parent = frames[-1]
+            location = parent[2]
+            if parent[0]:
+                parent[2] += 1  # Advance the parent array's index
+            parent_role = parent[1]
+        else:
+            location, parent_role = None, None
+        is_container = event in ('start_map', 'start_array')
+        if parent_role == 'node' and not is_container:
+            if location in NAV_NODE_FIELDS:
+                parent[3][0][location] = value  # Keep only the fields an entry needs
+            continue
+        if not is_container:
+            continue
+        role, data = 'skip', None
+        if parent_role is None:
+            if event == 'start_array':
+                role, data = 'path', 0
+        elif parent_role == 'path':
+            matched = parent[3]
+            if location == NAV_TREE_PATH[matched]:
+                if matched + 1 == len(NAV_TREE_PATH):
+                    role = 'tree' if event == 'start_map' else 'skip'
+                else:
+                    role, data = 'path', matched + 1
+        elif parent_role in ('tree', 'node') and location == 'children' and event == 'start_array':
+            role = 'children'
+            if parent_role == 'node' and not parent[3][1]:
+                # A node's fields normally precede its children, so emit it before them
+                if all(key in parent[3][0] for key in NAV_NODE_FIELDS):
+                    entry = take_entry(parent[3])
+                    if entry is not None:
+                        yield entry
+        elif parent_role == 'children' and event == 'start_map':
+            role, data = 'node', [{}, False]
+        frames.append([event == 'start_array', role, 0 if event == 'start_array' else None, data])
+
 def extract_tree_data(tree_data, base_url=BASE_URL):
     """
     Extracts navigation data from a hierarchical 'tree' structure into a flat list of dictionaries.
 
     The 'tree' structure is a nested JSON object from the Snowflake documentation site,
-    containing navigation links. This function recursively processes the tree, extracting relevant
-    fields (id, url, label, type, depth, parent_url) for each node, and resolves relative URLs.
+    containing navigation links. This function walks the tree iteratively (see
+    iter_tree_entries), extracting relevant fields (id, url, label, type, depth, parent_url)
+    for each node, and resolves relative URLs.
 
     Args:
         tree_data (dict): The 'tree' object from the JSON response, typically containing a 'children' key.
@@ -34,63 +223,97 @@ def extract_tree_data(tree_data, base_url=BASE_URL):
         list: A list of dictionaries, each containing navigation data:
               {'id', 'url', 'label', 'type', 'depth', 'parent_url'}.
     """
-    def process_node(node, result_list):
-        """
-        Recursively processes a single node in the tree, extracting its data and adding it to result_list.
+    return list(iter_tree_entries(tree_data, base_url))
 
-        Args:
-            node (dict): The current node in the tree.
-            result_list (list): The list to append extracted data to.
-        """
-        # Skip if node is not a dictionary (e.g., None or unexpected type)
-        if not isinstance(node, dict):
-            return
-        # Check if the node has all required fields to be a valid navigation entry
-        if all(key in node for key in ['id', 'href', 'label', 'type', 'depth', 'parentRef']):
-            # Create an entry with the node's data, resolving URLs as needed
-            entry = {
-                'id': node['id'],
-                'url': resolve_url(node['href'], base_url),  # Resolve the href to a full URL
-                'label': node['label'],
-                'type': node['type'],
-                'depth': node['depth'],
-                'parent_url': resolve_url(node['parentRef'], base_url)  # Resolve the parent reference
-            }
-            result_list.append(entry)
-        # Recursively process any children of this node
-        if 'children' in node and isinstance(node['children'], list):
-            for child in node['children']:
-                process_node(child, result_list)
-    
-    result = []  # Initialize the list to store all extracted navigation entries
-    # Check if the tree_data has a 'children' key and it's a list, then process each child
-    if 'children' in tree_data and isinstance(tree_data['children'], list):
-        for child in tree_data['children']:
-            process_node(child, result)
-    return result
-
-def scrape_navigation(client, url, params):
+def _supports_streaming(client):
+    """
+    Returns True if the client's scrape_url can return the raw HTTP response (stream=True).
+    """
+    # Wrappers report whether the client they wrap can stream
+    declared = getattr(client, 'supports_streaming', None)
+    if declared is not None:
+        return declared
+    scrape_url = getattr(client, 'scrape_url', None)
+    if scrape_url is None:
+        return False
+    try:
+        return 'stream' in inspect.signature(scrape_url).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _is_transient(error):
+    """
+    Returns True if a failed request may succeed when it is sent again.
+    """
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    if isinstance(error, requests.RequestException):
+        return True  # Dropped connections and timeouts
+    return bool(TRANSIENT_ERROR.search(str(error)))
+
+def scrape_navigation(client, url, params, dedupe=False, attempts=NAV_FETCH_ATTEMPTS):
     """
     Scrapes navigation data from a given URL using the Spider client.
 
     This function sends a request to the specified URL, expecting a JSON response containing
-    a 'tree' structure with navigation data. It extracts the tree and processes it into a list
-    of navigation entries using extract_tree_data.
+    a 'tree' structure with navigation data, and turns the tree into a list of navigation
+    entries. When the client can return the raw HTTP response (the synchronous Spider client),
+    the body is parsed incrementally with iter_tree_entries_from_json instead of being loaded
+    whole; other clients return parsed JSON, which is walked with iter_tree_entries.
+
+    A section depends on this single request, so throttling, server errors and dropped
+    connections are retried after a jittered backoff, up to `attempts` tries. Each try goes
+    through the client again, so a ScheduledSpider admits and rate-limits it like any other
+    request.
 
     Args:
         client (Spider): The Spider client instance for making HTTP requests.
         url (str): The URL to scrape.
         params (dict): Parameters to pass to the Spider client's scrape_url method.
+        dedupe (bool, optional): Drop entries whose URL was already seen. Defaults to False.
+        attempts (int, optional): Tries before a transient error is raised. Defaults to
+            NAV_FETCH_ATTEMPTS.
 
     Returns:
         list: A list of navigation entries extracted from the tree data.
 
     Raises:
         ValueError: If the response format is unexpected (not a list).
+        requests.HTTPError: If a streamed request returns an error status.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return _fetch_navigation(client, url, params, dedupe)
+        except Exception as e:
+            if attempt >= attempts or not _is_transient(e):
+                raise
+            delay = backoff_delay(attempt)
+            metrics.incr("nav_retries")
+            logger.warning(f"Navigation fetch for {url} failed ({str(e)}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+def _fetch_navigation(client, url, params, dedupe):
+    """
+    Sends one navigation request and extracts its entries; see scrape_navigation.
     """
     logger.info(f"Scraping navigation data from {url}")
+    if _supports_streaming(client):
+        # Stream the response body instead of building the whole JSON document in memory
+        with metrics.stage("nav_fetch"):
+            response = client.scrape_url(url, params=params, stream=True)
+        try:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Let urllib3 undo any gzip/deflate encoding
+            with metrics.stage("nav_parse"):
+                return list(iter_tree_entries_from_json(response.raw, dedupe=dedupe))
+        except ijson.JSONError as e:
+            raise ValueError(f"Unexpected response format: {e}") from e
+        finally:
+            response.close()
     # Make the HTTP request to scrape the URL
-    result_list = client.scrape_url(url, params=params)
+    with metrics.stage("nav_fetch"):
+        result_list = client.scrape_url(url, params=params)
     # Validate that the response is a list as expected
     if not result_list or not isinstance(result_list, list):
         raise ValueError("Unexpected response format: Expected a list")
@@ -104,109 +327,344 @@ def scrape_navigation(client, url, params):
               .get('tree')
     )
     # Extract navigation data from the tree, or return an empty list if tree is not found
-    return extract_tree_data(tree_location) if tree_location else []
+    with metrics.stage("nav_parse"):
+        return list(iter_tree_entries(tree_location, dedupe=dedupe)) if tree_location else []
+
+async def _scrape_batch_async(client, batch_urls, params):
+    """
+    Sends a single batch of URLs to the Spider API without blocking the event loop.
+
+    The client is synchronous (Spider, or one of the CachedSpider / ScheduledSpider wrappers
+    around it), so each call runs in a worker thread of the loop's default executor. The
+    number of batches in flight is therefore bounded by the caller's concurrency limit and
+    the size of that thread pool.
+
+    Args:
+        client (Spider): The Spider client instance for making HTTP requests.
+        batch_urls (list): The URLs to scrape in this batch.
+        params (dict): Parameters to pass to the Spider client's scrape_url method.
+
+    Returns:
+        list: The raw result dictionaries returned by the Spider API for the batch.
+    """
+    # Concatenate URLs into a comma-separated string as required by the Spider API
+    concatenated_urls = ','.join(batch_urls)
+    # Run the blocking client in a thread so the event loop can keep other batches moving
+    return await asyncio.to_thread(client.scrape_url, concatenated_urls, params=params) or []
 
-def scrape_text_content(client, urls, params, batch_size=50, max_retries=3):
+def is_successful(res):
+    """
+    Returns True if a Spider result holds usable content (status 200, content exists, no error).
+
+    CachedSpider uses the same test to decide what to cache, so a result the scraper would
+    retry is never served back to it from the cache.
+    """
+    return res.get('status') == 200 and bool(res.get('content')) and not res.get('error')
+
+async def scrape_text_content_async(client, urls, params, batch_size=50, max_retries=3, concurrency=4, failures=None):
+    """
+    Scrapes text content from a list of URLs with several batches in flight at once.
+
+    The event loop only schedules the work: each batch request is a blocking Spider call made
+    from a worker thread, so this is a thread-pool engine driven by asyncio. URLs are sent in
+    batches, with at most `concurrency` batch requests outstanding at any time, and results
+    are yielded as soon as each batch finishes. Failures are retried by a scheduler rather
+    than by resending everything:
+
+    - A batch request that is rejected as a whole (it raises or returns no results) is split
+      in half and both halves are retried straight away, to isolate a URL that breaks the
+      request. Splitting charges no attempts, so one bad URL costs only itself; attempts are
+      charged when a single URL is rejected or a batch is retried whole. Batches are not split
+      while the circuit breaker is open or when the error affects the whole endpoint
+      (authentication, payment, throttling or a server error); they are backed off instead,
+      so an outage opens the breaker after a few splits rather than probing every URL.
+    - URLs that fail individually are retried after a jittered exponential backoff, up to
+      max_retries attempts per URL.
+    - A circuit breaker pauses all requests after repeated failed batches. Each time it opens
+      or its probe fails, every URL still waiting is charged an attempt.
+    - The size of new batches adapts to observed latency and error rate (capped at batch_size).
+    - When the client refuses a batch because its credit budget is spent (see
+      ScheduledSpider), that batch and every URL still queued are given up without retrying.
+
+    URLs that still fail after max_retries attempts are appended to `failures` when a list is
+    given; otherwise they are yielded with empty content, as before.
+
+    Args:
+        client (Spider): The Spider client instance for making HTTP requests.
+        urls (list): List of URLs to scrape.
+        params (dict): Parameters to pass to the Spider client's scrape_url method.
+        batch_size (int, optional): Initial and maximum number of URLs per batch. Defaults to 50.
+        max_retries (int, optional): Number of attempts per URL before giving up. Defaults to 3.
+        concurrency (int, optional): Maximum number of batch requests in flight. Defaults to 4.
+        failures (list, optional): Receives {'url', 'error', 'attempts'} dictionaries for URLs
+            that could not be scraped. Defaults to None.
+
+    Yields:
+        list: The dictionaries with 'url' and 'content' keys scraped by one batch.
+    """
+    loop = asyncio.get_running_loop()
+    # Remove duplicates from the URL list (keeping order) to avoid redundant scraping
+    fresh = deque(dict.fromkeys(urls))  # URLs that have not been sent yet
+    retry_heap = []  # (ready_at, seq, batch_urls) for bisected batches and backed-off retries
+    seq = itertools.count()  # Tie-breaker so the heap never compares URL lists
+    attempts = defaultdict(int)  # Failed attempts per URL
+    last_error = {}  # Most recent failure reason per URL
+    given_up = set()  # URLs that exhausted their attempts
+    scraped = set()  # URLs that have already been yielded to the caller
+    in_flight = {}  # Running task -> (batch_urls, started_at)
+    sizer = AdaptiveBatchSizer(batch_size)
+    breaker = CircuitBreaker()
+
+    def next_batch(now):
+        # Due retries go first, then fresh URLs at the current adaptive batch size
+        if retry_heap and retry_heap[0][0] <= now:
+            return heapq.heappop(retry_heap)[2]
+        if fresh:
+            return [fresh.popleft() for _ in range(min(sizer.batch_size, len(fresh)))]
+        return None
+
+    def schedule(batch_urls, delay):
+        heapq.heappush(retry_heap, (loop.time() + delay, next(seq), batch_urls))
+
+    def charge_attempt(batch_urls):
+        # Charge each URL an attempt, returning the URLs that still have attempts left
+        remaining = []
+        for u in batch_urls:
+            attempts[u] += 1
+            if attempts[u] >= max_retries:
+                given_up.add(u)
+            else:
+                remaining.append(u)
+        return remaining
+
+    def record_url_failures(batch_urls):
+        # Back off the URLs that still have attempts left; URLs with equal attempts retry together
+        by_attempt = defaultdict(list)
+        for u in charge_attempt(batch_urls):
+            by_attempt[attempts[u]].append(u)
+        metrics.incr("url_retries", sum(len(group) for group in by_attempt.values()))
+        for attempt, group in by_attempt.items():
+            for i in range(0, len(group), sizer.batch_size):
+                schedule(group[i:i+sizer.batch_size], backoff_delay(attempt))
+
+    try:
+        while fresh or retry_heap or in_flight:
+            now = loop.time()
+            # Fill free slots with ready batches while the endpoint is considered healthy
+            while len(in_flight) < concurrency:
+                has_ready_batch = bool(fresh) or bool(retry_heap and retry_heap[0][0] <= now)
+                if not has_ready_batch or not breaker.allow_request(now):
+                    break
+                batch_urls = next_batch(now)
+                task = asyncio.create_task(_scrape_batch_async(client, batch_urls, params))
+                # A batch sent while the breaker is open is its half-open probe
+                in_flight[task] = (batch_urls, now, breaker.open_until is not None)
+
+            # With a free slot, also wake up for the next pending retry or the breaker's next probe
+            wake_times = []
+            if len(in_flight) < concurrency:
+                if retry_heap and retry_heap[0][0] > now:
+                    wake_times.append(retry_heap[0][0])
+                if breaker.open_until is not None and breaker.open_until > now:
+                    wake_times.append(breaker.open_until)
+            timeout = min(wake_times) - now if wake_times else None
+            if not in_flight:
+                await asyncio.sleep(timeout or 0)
+                continue
+            done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                batch_urls, started_at, probe = in_flight.pop(task)
+                latency = loop.time() - started_at
+                batch_rows = []
+                endpoint_error = False  # Whether the failure concerns the endpoint, not the URLs
+                metrics.observe("spider_batch", latency)
+                metrics.incr("spider_requests")
+                try:
+                    results = task.result()
+                except CreditBudgetExceeded as e:
+                    # Nothing more can be afforded: give up on this batch and everything still queued
+                    refused = batch_urls + list(fresh) + [u for _, _, queued in retry_heap for u in queued]
+                    fresh.clear()
+                    retry_heap.clear()
+                    for u in refused:
+                        last_error[u] = str(e)
+                        given_up.add(u)
+                    logger.warning(f"{e} Giving up on {len(refused)} URLs.")
+                    continue
+                except Exception as e:
+                    results = []
+                    endpoint_error = bool(ENDPOINT_ERROR.search(str(e)))
+                    metrics.incr("spider_batch_errors")
+                    for u in batch_urls:
+                        last_error[u] = f"Batch request failed: {e}"
+                for res in results:
+                    url = res.get('url')
+                    if is_successful(res):
+                        if url not in scraped:
+                            scraped.add(url)
+                            batch_rows.append({"url": url, "content": res['content']})
+                    elif url:
+                        last_error[url] = res.get('error') or f"HTTP status {res.get('status')}"
+                missing = [u for u in batch_urls if u not in scraped]
+                for u in missing:
+                    last_error.setdefault(u, "No result returned")
+                batch_failed = len(missing) == len(batch_urls)
+                was_open = breaker.open_until is not None
+                breaker.record(not batch_failed, loop.time())
+                if batch_failed and breaker.open_until is not None and (probe or not was_open):
+                    # The breaker just opened or its probe failed: the endpoint is down for every
+                    # waiting URL too, so each trip costs them an attempt and an outage ends
+                    # after max_retries trips
+                    queued = list(fresh) + [u for _, _, waiting in retry_heap for u in waiting]
+                    fresh.clear()
+                    retry_heap.clear()
+                    record_url_failures(queued)
+                sizer.record(latency, len(missing) / len(batch_urls))
+                if batch_rows:
+                    metrics.incr("pages_scraped", len(batch_rows))
+                    metrics.incr("bytes_fetched", sum(len(row['content'].encode('utf-8')) for row in batch_rows))
+                    yield batch_rows
+                if not missing:
+                    continue
+                if (not results and len(batch_urls) > 1 and not endpoint_error
+                        and breaker.open_until is None):
+                    # The request was rejected as a whole: bisect to isolate the bad URL(s).
+                    # Splitting costs no attempts, so the split always reaches a single URL
+                    metrics.incr("batch_bisections")
+                    mid = len(batch_urls) // 2
+                    schedule(batch_urls[:mid], 0)
+                    schedule(batch_urls[mid:], 0)
+                else:
+                    record_url_failures(missing)
+            if retry_heap and not in_flight and not fresh:
+                logger.info(f"{len(scraped)} URLs scraped, {len(retry_heap)} batch(es) waiting to retry.")
+    finally:
+        # Make sure no batch keeps running if the caller stops early
+        for task in in_flight:
+            task.cancel()
+
+    if given_up:
+        metrics.incr("pages_failed", len(given_up))
+        if failures is not None:
+            logger.error(f"After {max_retries} attempts, {len(given_up)} URLs still failed. Reporting as failures.")
+            failures.extend(
+                {"url": u, "error": last_error.get(u, ""), "attempts": attempts[u]} for u in given_up
+            )
+        else:
+            logger.error(f"After {max_retries} attempts, {len(given_up)} URLs still failed. Adding with empty content.")
+            yield [{"url": u, "content": ""} for u in given_up]
+
+def iter_text_content(client, urls, params, batch_size=50, max_retries=3, concurrency=4, failures=None):
+    """
+    Scrapes text content from a list of URLs, yielding each batch's results as it finishes.
+
+    This is a blocking generator around scrape_text_content_async for use from synchronous
+    code. The concurrent engine runs on a private event loop which is advanced each time the
+    caller asks for the next batch, so only the batches currently in flight are held in memory.
+
+    Args:
+        client (Spider): The Spider client instance for making HTTP requests.
+        urls (list): List of URLs to scrape.
+        params (dict): Parameters to pass to the Spider client's scrape_url method.
+        batch_size (int, optional): Initial and maximum number of URLs per batch. Defaults to 50.
+        max_retries (int, optional): Number of attempts per URL before giving up. Defaults to 3.
+        concurrency (int, optional): Maximum number of batch requests in flight. Defaults to 4.
+        failures (list, optional): Receives URLs that could not be scraped instead of them being
+            yielded with empty content. Defaults to None.
+
+    Yields:
+        list: The dictionaries with 'url' and 'content' keys scraped by one batch.
+    """
+    loop = asyncio.new_event_loop()
+    batches = scrape_text_content_async(
+        client, urls, params, batch_size=batch_size, max_retries=max_retries, concurrency=concurrency,
+        failures=failures
+    )
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(batches.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Cancel any outstanding batches if the caller stopped early, then release the loop
+        loop.run_until_complete(batches.aclose())
+        loop.close()
+
+def scrape_text_content(client, urls, params, batch_size=50, max_retries=3, concurrency=4, failures=None):
     """
     Scrapes text content from a list of URLs in batches, with retry logic for failed requests.
 
-    This function processes URLs in batches to avoid overwhelming the server, retrying failed
-    requests up to max_retries times. It returns a list of dictionaries containing the URL and
-    its scraped content. Failed URLs (after all retries) are included with empty content.
+    This is a blocking wrapper around iter_text_content which collects every batch into a
+    single list. It returns a list of dictionaries containing the URL and its scraped content.
+    Failed URLs (after all retries) are included with empty content unless a `failures` list
+    is given to collect them.
 
     Args:
         client (Spider): The Spider client instance for making HTTP requests.
         urls (list): List of URLs to scrape.
         params (dict): Parameters to pass to the Spider client's scrape_url method.
-        batch_size (int, optional): Number of URLs to process in each batch. Defaults to 50.
-        max_retries (int, optional): Number of retry attempts for failed URLs. Defaults to 3.
+        batch_size (int, optional): Initial and maximum number of URLs per batch. Defaults to 50.
+        max_retries (int, optional): Number of attempts per URL before giving up. Defaults to 3.
+        concurrency (int, optional): Maximum number of batch requests in flight. Defaults to 4.
+        failures (list, optional): Receives {'url', 'error', 'attempts'} dictionaries for URLs
+            that could not be scraped. Defaults to None.
 
     Returns:
         list: A list of dictionaries, each with 'url' and 'content' keys.
     """
-    # Remove duplicates from the URL list to avoid redundant scraping
-    all_unique_urls = set(urls)
-    fails = set(all_unique_urls)  # Initially, all URLs are considered "failed" until successfully scraped
-    success_map = {}  # Dictionary to store successful results: {url: content}
-    attempt = 1
-    # Continue retrying until max_retries is reached or all URLs are successfully scraped
-    while attempt <= max_retries and fails:
-        logger.info(f"Scrape attempt {attempt} for {len(fails)} total URLs.")
-        fail_list = list(fails)
-        # Process URLs in batches of size batch_size
-        for i in range(0, len(fail_list), batch_size):
-            batch_urls = fail_list[i:i+batch_size]
-            # Concatenate URLs into a comma-separated string as required by the Spider API
-            concatenated_urls = ','.join(batch_urls)
-            # Scrape the batch of URLs
-            results = client.scrape_url(concatenated_urls, params=params)
-            # Process each result in the batch
-            for res in results:
-                # Check if the request was successful (status 200, content exists, no error)
-                if res.get('status') == 200 and res.get('content') and not res.get('error'):
-                    success_map[res['url']] = res['content']
-        # Remove successfully scraped URLs from the fails set
-        fails = fails - set(success_map.keys())
-        if fails:
-            logger.info(f"After attempt {attempt}, {len(fails)} URLs remain unsatisfied.")
-        attempt += 1
-    # If any URLs still failed after all retries, include them with empty content
-    if fails:
-        logger.error(f"After {max_retries} attempts, {len(fails)} URLs still failed. Adding with empty content.")
-        for url in fails:
-            success_map[url] = ""
-    # Convert the success map to a list of dictionaries
-    return [{"url": u, "content": c} for u, c in success_map.items()]
-
-def scrape_section(client, url, section_name):
+    return [
+        row
+        for batch_rows in iter_text_content(
+            client, urls, params, batch_size=batch_size, max_retries=max_retries, concurrency=concurrency,
+            failures=failures
+        )
+        for row in batch_rows
+    ]
+
+def scrape_section(client, url, section_name, nav_only=True):
     """
     Scrapes navigation data for a specific section of the Snowflake documentation.
 
     This function configures parameters for scraping navigation data, calls scrape_navigation
-    to retrieve the data, and removes duplicates based on URLs before returning the results.
+    to retrieve the data, and removes duplicates based on URLs in the same pass. By default
+    only the page's JSON data is requested (NAV_ONLY_PARAMS): the landing page's text, links
+    and metadata are never used, so there is no reason to pay for them.
 
     Args:
         client (Spider): The Spider client instance for making HTTP requests.
         url (str): The URL of the section to scrape.
         section_name (str): The name of the section (e.g., 'guides', 'developer').
+        nav_only (bool, optional): Request the minimal navigation payload. Set to False to
+            request the full page (readability text, metadata and links). Defaults to True.
 
     Returns:
         list: A list of unique navigation entries for the section.
     """
     # Define parameters for the Spider client to scrape navigation data
-    crawler_params = {
-        'proxy_enabled': True,  # Use a proxy for the request
-        'store_data': False,  # Do not store raw data on the Spider server
-        'metadata': True,  # Include metadata in the response
-        'return_page_links': True,  # Include links found on the page
-        'return_json_data': True,  # Include JSON data in the response
-        'readability': True,  # Use readability parsing to extract clean content
-        'return_format': 'text'  # Return the content as text
-    }
-    # Scrape the navigation data for the section
-    tree_data = scrape_navigation(client, url, crawler_params)
-    # Remove duplicates by URL to avoid redundant entries
-    unique_tree_data = []
-    seen_urls = set()
-    for row in tree_data:
-        if row['url'] not in seen_urls:
-            seen_urls.add(row['url'])
-            unique_tree_data.append(row)
-    return unique_tree_data
+    crawler_params = NAV_ONLY_PARAMS if nav_only else FULL_NAV_PARAMS
+    # Scrape the navigation data for the section, removing duplicate URLs as the tree is read
+    return scrape_navigation(client, url, dict(crawler_params), dedupe=True)
 
-def scrape_text_for_section(client, tree_data):
+def iter_text_for_section(client, tree_data, concurrency=SCRAPE_CONCURRENCY, failures=None):
     """
-    Scrapes text content for all URLs found in the navigation data of a section.
+    Scrapes text content for all URLs in a section's navigation data, one batch at a time.
 
-    This function extracts URLs from the navigation data (tree_data) and scrapes their text content
-    using scrape_text_content with specific parameters for text extraction.
+    This is the streaming counterpart of scrape_text_for_section: results are yielded as each
+    batch completes, so callers can write them out without holding the whole section in memory.
+    Content is requested as markdown after readability extraction, so page headings survive
+    for split_sections in core.chunking.
 
     Args:
         client (Spider): The Spider client instance for making HTTP requests.
         tree_data (list): List of navigation entries containing URLs to scrape.
+        concurrency (int, optional): Maximum number of batch requests in flight.
+            Defaults to SCRAPE_CONCURRENCY.
+        failures (list, optional): Receives URLs that could not be scraped. Defaults to None.
 
-    Returns:
-        list: A list of dictionaries with 'url' and 'content' for each scraped URL.
+    Yields:
+        list: The dictionaries with 'url' and 'content' keys scraped by one batch.
     """
     # Extract all URLs from the navigation data
     all_urls = [item['url'] for item in tree_data]
@@ -215,7 +673,30 @@ def scrape_text_for_section(client, tree_data):
         'proxy_enabled': True,  # Use a proxy for the request
         'store_data': False,  # Do not store raw data on the Spider server
         'readability': True,  # Use readability parsing to extract clean content
-        'return_format': 'text'  # Return the content as text
+        'return_format': TEXT_FORMAT  # Markdown keeps headings, which the chunker splits pages at
     }
     # Scrape text content for all URLs, using a larger batch size for efficiency
-    return scrape_text_content(client, all_urls, text_crawler_params, batch_size=500, max_retries=3)
\ No newline at end of file
+    yield from iter_text_content(
+        client, all_urls, text_crawler_params, batch_size=500, max_retries=3, concurrency=concurrency,
+        failures=failures
+    )
+
+def scrape_text_for_section(client, tree_data, concurrency=SCRAPE_CONCURRENCY, failures=None):
+    """
+    Scrapes text content for all URLs found in the navigation data of a section.
+
+    This function collects every batch produced by iter_text_for_section into a single list.
+
+    Args:
+        client (Spider): The Spider client instance for making HTTP requests.
+        tree_data (list): List of navigation entries containing URLs to scrape.
+        concurrency (int, optional): Maximum number of batch requests in flight.
+            Defaults to SCRAPE_CONCURRENCY.
+        failures (list, optional): Receives URLs that could not be scraped. Defaults to None.
+
+    Returns:
+        list: A list of dictionaries with 'url' and 'content' for each scraped URL.
+    """
+    return [
+        row for batch_rows in iter_text_for_section(client, tree_data, concurrency, failures) for row in batch_rows
+    ]
@@ -0,0 +1,301 @@
+import gzip
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+import requests
+from .config import logger, SITEMAP_URL, SITEMAP_INDEX_PATH, SITEMAP_TIMEOUT
+from .metrics import metrics
+
+# Namespace of the elements defined by the sitemaps.org protocol
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+# Nested sitemap indexes followed before giving up, guarding against cycles
+MAX_SITEMAP_DEPTH = 3
+# URLs looked up or written per SQLite statement
+LOOKUP_BATCH = 500
+
+def normalize_url(url):
+    """
+    Normalises a page URL so sitemap and navigation URLs compare equal.
+
+    Surrounding whitespace, fragments and a trailing slash are removed.
+    """
+    return url.strip().split('#', 1)[0].rstrip('/')
+
+def _local_name(tag):
+    """
+    Returns the sitemaps.org element name of a tag, or None for elements of other namespaces.
+    """
+    if tag.startswith(SITEMAP_NS):
+        return tag[len(SITEMAP_NS):]
+    # Some generators omit the namespace; extension elements (e.g. image:loc) keep theirs
+    return None if tag.startswith('{') else tag
+
+def iter_sitemap(stream):
+    """
+    Parses a sitemap or sitemap index document incrementally.
+
+    The document is read with iterparse and every finished <url> or <sitemap> element is
+    cleared from the tree as soon as it has been yielded, so memory use stays constant however
+    many URLs the sitemap lists.
+
+    Args:
+        stream (file-like): Binary stream holding the XML document.
+
+    Yields:
+        tuple: (kind, loc, lastmod), where kind is 'url' for a page or 'sitemap' for a nested
+            sitemap, and lastmod is the stripped <lastmod> text or None when it is missing.
+    """
+    root = None
+    loc = lastmod = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        name = _local_name(elem.tag)
+        if name == "loc":
+            loc = (elem.text or "").strip()
+        elif name == "lastmod":
+            lastmod = (elem.text or "").strip() or None
+        elif name in ("url", "sitemap"):
+            if loc:
+                yield name, loc, lastmod
+            loc = lastmod = None
+            # Drop finished entries so the parsed tree never grows
+            root.clear()
+
+def open_sitemap(location, timeout=SITEMAP_TIMEOUT):
+    """
+    Opens a sitemap as a binary stream, decompressing gzipped sitemaps on the fly.
+
+    Args:
+        location (str): An http(s) URL, or a local file path.
+        timeout (float, optional): Seconds to wait for the server. Defaults to SITEMAP_TIMEOUT.
+
+    Returns:
+        file-like: A binary stream of the XML document; the caller closes it.
+
+    Raises:
+        requests.RequestException: If the sitemap cannot be downloaded.
+        OSError: If a local sitemap cannot be read.
+    """
+    if urlsplit(location).scheme in ("http", "https"):
+        response = requests.get(location, stream=True, timeout=timeout)
+        response.raise_for_status()
+        response.raw.decode_content = True  # Let urllib3 undo any gzip/deflate transfer encoding
+        stream = response.raw
+    else:
+        stream = open(location, "rb")
+    # Sitemaps may also be stored as .xml.gz files
+    return gzip.GzipFile(fileobj=stream) if location.endswith(".gz") else stream
+
+def iter_sitemap_pages(location, opener=open_sitemap, depth=0):
+    """
+    Yields every page listed by a sitemap, following nested sitemap indexes.
+
+    Nested sitemaps are fetched after their index has been read and closed, so at most one
+    download is open at a time.
+
+    Args:
+        location (str): URL or path of the sitemap or sitemap index.
+        opener (callable, optional): Opens a location as a binary stream. Defaults to open_sitemap.
+        depth (int, optional): Current nesting level. Defaults to 0.
+
+    Yields:
+        tuple: (url, lastmod) for each page; lastmod is None when the sitemap omits it.
+
+    Raises:
+        ValueError: If sitemap indexes are nested more than MAX_SITEMAP_DEPTH levels deep.
+        xml.etree.ElementTree.ParseError: If a sitemap is not well-formed XML.
+    """
+    if depth > MAX_SITEMAP_DEPTH:
+        raise ValueError(f"Sitemap indexes nested more than {MAX_SITEMAP_DEPTH} levels deep at {location}")
+    nested = []  # Sitemaps listed by an index; only their locations are kept
+    stream = opener(location)
+    try:
+        for kind, loc, lastmod in iter_sitemap(stream):
+            if kind == "url":
+                yield loc, lastmod
+            else:
+                nested.append(loc)
+    finally:
+        stream.close()
+    for loc in nested:
+        yield from iter_sitemap_pages(loc, opener, depth + 1)
+
+class LastmodIndex:
+    """
+    Locally persisted URL -> lastmod index, used to find the pages that changed since they
+    were last scraped.
+
+    refresh() streams the sitemap and compares each page's lastmod with the lastmod recorded
+    when the page was last stored. Pages that are new, whose lastmod changed, or whose
+    previous change was never stored are marked as changed; pages missing from the sitemap
+    are dropped from the index. A page's new lastmod only becomes its recorded lastmod once
+    commit() is called for it, after its text has been uploaded, so a page that fails to
+    scrape is reported as changed again by the next run. Pages without a lastmod are only
+    reported as changed until they have been stored once.
+
+    The index is a SQLite database, so the diff runs in constant memory, and it is safe to
+    share between threads. If the sitemap cannot be read, the refresh is rolled back and the
+    index is left as it was.
+
+    Args:
+        path (str, optional): Location of the SQLite database. Defaults to SITEMAP_INDEX_PATH.
+    """
+
+    def __init__(self, path=SITEMAP_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.run_id = None  # Identifies the pages seen by the current refresh
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,     -- normalize_url() of the page URL
+                    lastmod TEXT,             -- lastmod when the page was last stored, NULL if never
+                    pending TEXT,             -- lastmod of a change not stored yet ('' if unknown)
+                    seen_run INTEGER NOT NULL -- Refresh that last saw the page in the sitemap
+                )
+            """)
+
+    def refresh(self, location=SITEMAP_URL, opener=open_sitemap):
+        """
+        Reads the sitemap and marks the pages that changed since they were last stored.
+
+        Args:
+            location (str, optional): URL or path of the sitemap. Defaults to SITEMAP_URL.
+            opener (callable, optional): Opens a location as a binary stream. Defaults to open_sitemap.
+
+        Returns:
+            bool: True if the sitemap was read and listed at least one page; False if it could
+                not be used, in which case callers should fall back to the navigation trees.
+        """
+        run_id = time.time_ns()
+        listed = changed = 0
+        try:
+            with metrics.stage("sitemap_refresh"), self.lock, self.conn:
+                batch = []
+                for url, lastmod in iter_sitemap_pages(location, opener):
+                    batch.append((normalize_url(url), lastmod))
+                    if len(batch) >= LOOKUP_BATCH:
+                        changed += self._diff_batch(batch, run_id)
+                        listed += len(batch)
+                        batch = []
+                changed += self._diff_batch(batch, run_id)
+                listed += len(batch)
+                if not listed:
+                    raise ValueError("the sitemap lists no pages")
+                removed = self.conn.execute("DELETE FROM pages WHERE seen_run <> ?", (run_id,)).rowcount
+        except Exception as e:
+            logger.warning(f"Could not use sitemap {location} ({str(e)}); falling back to navigation trees.")
+            return False
+        self.run_id = run_id
+        metrics.incr("sitemap_pages", listed)
+        metrics.incr("sitemap_pages_changed", changed)
+        metrics.incr("sitemap_pages_removed", removed)
+        logger.info(
+            f"Sitemap {location} lists {listed} pages: {changed} new or changed, "
+            f"{removed} no longer listed."
+        )
+        return True
+
+    def _diff_batch(self, batch, run_id):
+        """
+        Compares a batch of (url, lastmod) pairs with the index and records them as seen.
+
+        Must be called with the lock held inside a transaction. Returns the number of pages
+        in the batch that changed.
+        """
+        if not batch:
+            return 0
+        placeholders = ",".join("?" * len(batch))
+        stored = dict(self.conn.execute(
+            f"SELECT url, lastmod FROM pages WHERE url IN ({placeholders})", [url for url, _ in batch]
+        ).fetchall())
+        rows = []
+        changed = 0
+        for url, lastmod in batch:
+            recorded = stored.get(url)
+            # Without a lastmod a stored page can't be known to have changed
+            is_changed = recorded is None or (lastmod is not None and lastmod != recorded)
+            changed += is_changed
+            rows.append((url, (lastmod or '') if is_changed else None, run_id))
+        self.conn.executemany("""
+            INSERT INTO pages (url, lastmod, pending, seen_run) VALUES (?, NULL, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET pending = excluded.pending, seen_run = excluded.seen_run
+        """, rows)
+        return changed
+
+    def classify(self, urls):
+        """
+        Looks up whether pages listed by the current sitemap changed.
+
+        Args:
+            urls (list): Page URLs.
+
+        Returns:
+            dict: URL -> True (changed) or False (unchanged), for the URLs the sitemap lists.
+                URLs it does not list are left out.
+        """
+        status = {}
+        with self.lock:
+            for i in range(0, len(urls), LOOKUP_BATCH):
+                batch = {normalize_url(url): url for url in urls[i:i + LOOKUP_BATCH]}
+                placeholders = ",".join("?" * len(batch))
+                for key, is_changed in self.conn.execute(
+                    f"SELECT url, pending IS NOT NULL FROM pages WHERE seen_run = ? AND url IN ({placeholders})",
+                    [self.run_id, *batch]
+                ):
+                    status[batch[key]] = bool(is_changed)
+        return status
+
+    def select(self, entries, fallback=None):
+        """
+        Chooses the navigation entries whose pages need scraping.
+
+        A page is scraped if the navigation-tree path chose it (it is in `fallback`: new,
+        missing content, stale or changed in the navigation) or if the sitemap lists it as
+        changed. The sitemap only adds pages, so a listed page without stored content is
+        still fetched even though its lastmod is unchanged. Without a fallback every page is
+        scraped.
+
+        Args:
+            entries (list): Every navigation entry of a section.
+            fallback (list, optional): The entries the navigation-tree path would scrape
+                (e.g. an incremental plan). Defaults to None.
+
+        Returns:
+            list: The entries to scrape, in their original order.
+        """
+        if fallback is None:
+            return list(entries)
+        status = self.classify([entry['url'] for entry in entries])
+        fallback_urls = {entry['url'] for entry in fallback}
+        return [entry for entry in entries if entry['url'] in fallback_urls or status.get(entry['url'], False)]
+
+    def commit(self, urls):
+        """
+        Records the pending lastmod of pages whose text has been stored.
+
+        Args:
+            urls (list): URLs of the stored pages; URLs the index doesn't know are ignored.
+        """
+        keys = [(normalize_url(url),) for url in urls]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE pages SET lastmod = pending, pending = NULL WHERE url = ? AND pending IS NOT NULL", keys
+            )
+
+    def close(self):
+        """
+        Closes the underlying SQLite connection.
+        """
+        with self.lock:
+            self.conn.close()
@@ -1,15 +1,85 @@
+import functools
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from snowflake.snowpark import Session
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
-from .config import logger, SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER, SNOWFLAKE_DATABASE, SNOWFLAKE_SCHEMA, SNOWFLAKE_WAREHOUSE
+from .config import (
+    logger, SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER, SNOWFLAKE_DATABASE, SNOWFLAKE_SCHEMA, SNOWFLAKE_WAREHOUSE,
+    SNOWFLAKE_POOL_SIZE, STREAM_FLUSH_ROWS, STREAM_FLUSH_BYTES, INCREMENTAL_REVALIDATE_DAYS, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+)
+from .bulk_loader import bulk_load
+from .metrics import metrics, run_query, submit_query
+from .hashing import content_hash, nav_entry_hash, utc_timestamp
+from .chunking import chunk_pages
+from .scraper import TEXT_FORMAT
 
+# Column layouts used when bulk loading into each table: (column_name, sql_type)
+NAV_COLUMNS = [
+    ("ID", "VARCHAR"),
+    ("URL", "VARCHAR"),
+    ("LABEL", "VARCHAR"),
+    ("TYPE", "VARCHAR"),
+    ("DEPTH", "INTEGER"),
+    ("PARENT_URL", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+    ("NAV_HASH", "VARCHAR"),
+]
+TXT_COLUMNS = [
+    ("URL", "VARCHAR"),
+    ("CONTENT", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+    ("CONTENT_HASH", "VARCHAR"),
+    ("FETCHED_AT", "TIMESTAMP_NTZ"),
+    ("DUPLICATE_OF", "VARCHAR"),
+    ("CONTENT_FORMAT", "VARCHAR"),
+]
+CHUNK_COLUMNS = [
+    ("URL", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+    ("CHUNK_INDEX", "INTEGER"),
+    ("HEADING", "VARCHAR"),
+    ("CONTENT", "VARCHAR"),
+    ("TOKEN_ESTIMATE", "INTEGER"),
+    ("DEPTH", "INTEGER"),
+    ("PARENT_URL", "VARCHAR"),
+    ("CONTENT_HASH", "VARCHAR"),
+]
+DUPLICATE_COLUMNS = [
+    ("URL", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+    ("DUPLICATE_OF", "VARCHAR"),
+    ("SIMILARITY", "FLOAT"),
+    ("DETECTED_AT", "TIMESTAMP_NTZ"),
+]
+BOILERPLATE_COLUMNS = [
+    ("HASH", "VARCHAR"),
+    ("CONTENT", "VARCHAR"),
+    ("FIRST_URL", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+    ("DETECTED_AT", "TIMESTAMP_NTZ"),
+]
+SECTION_COLUMNS = [
+    ("URL", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+]
+FAILURE_COLUMNS = [
+    ("URL", "VARCHAR"),
+    ("SECTION", "VARCHAR"),
+    ("ERROR", "VARCHAR"),
+    ("ATTEMPTS", "INTEGER"),
+    ("FAILED_AT", "TIMESTAMP_NTZ"),
+]
+
+@functools.lru_cache(maxsize=1)
 def load_private_key():
     """
     Loads and converts a private key from a PEM file to DER format for Snowflake authentication.
 
     This function reads a private key from a file named 'private_key.p8', decrypts it using a
     hardcoded password, and converts it to DER format, which is required for Snowflake's private
-    key authentication.
+    key authentication. The decoded key is cached, so opening several sessions reads and
+    decrypts the file only once.
 
     Returns:
         bytes: The private key in DER format.
@@ -61,63 +131,221 @@ def create_session():
     # Create and return a Snowpark session with the specified parameters
     return Session.builder.configs(connection_params).create()
 
-def setup_snowflake_tables(session):
+def use_staging_schema(session):
+    """
+    Points a session at the SNOWFLAKE_DOCUMENTATION.STAGING schema, where all tables live.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+    """
+    # Setting a qualified schema also sets the current database
+    run_query(session, "USE SCHEMA SNOWFLAKE_DOCUMENTATION.STAGING")
+
+class SessionPool:
+    """
+    Fixed set of Snowpark sessions, opened in parallel, used to load data concurrently.
+
+    A Snowpark session is not shared between threads in this project, so every thread that
+    writes to Snowflake gets a session of its own from the pool. Sessions are opened at the
+    same time, so connecting costs about one login however large the pool is, and each one is
+    pointed at the staging schema (see use_staging_schema). The first session, `primary`, is
+    the one used for table setup and other run-wide statements.
+
+    Args:
+        size (int, optional): Number of sessions. Defaults to SNOWFLAKE_POOL_SIZE.
+        factory (callable, optional): Opens one session. Defaults to create_session.
+
+    Raises:
+        Exception: If any session cannot be opened; sessions that did open are closed first.
+    """
+
+    def __init__(self, size=SNOWFLAKE_POOL_SIZE, factory=create_session):
+        def open_session():
+            session = factory()
+            use_staging_schema(session)
+            return session
+
+        size = max(1, size)
+        with ThreadPoolExecutor(max_workers=size, thread_name_prefix="session-connect") as pool:
+            futures = [pool.submit(open_session) for _ in range(size)]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        self.sessions = [future.result() for future in futures if future.exception() is None]
+        if errors:
+            self.close()
+            raise errors[0]
+        self.primary = self.sessions[0]
+        logger.info(f"Opened {size} Snowflake session(s).")
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def close(self):
+        """
+        Closes every session in the pool, logging (not raising) errors.
+        """
+        for session in self.sessions:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"Error closing Snowflake session: {str(e)}")
+
+def setup_snowflake_tables(session, incremental=False, resume=False):
     """
     Sets up the required Snowflake tables for storing scraped data.
 
-    This function ensures the session is using the correct database and schema, then creates or
-    replaces two tables: ONLINE_RESOURCES (for navigation data) and ONLINE_RESOURCES_TXT (for text
-    content). It logs the success or failure of table creation.
+    This function ensures the session is using the correct database and schema, then creates
+    two tables: ONLINE_RESOURCES (for navigation data) and ONLINE_RESOURCES_TXT (for text
+    content). In a full run the tables are replaced; in incremental mode existing tables and
+    their data are kept, and any hash/timestamp columns missing from older tables are added.
+    ONLINE_RESOURCES_SECTIONS maps every URL to each section that links to it, since a page's
+    content is stored only once in ONLINE_RESOURCES_TXT, under the section that scraped it.
+    ONLINE_RESOURCES_CHUNKS holds retrieval-ready passages of each page's content, and
+    ONLINE_RESOURCES_BOILERPLATE the paragraphs shared by many pages; both are kept like the
+    navigation and text tables. ONLINE_RESOURCES_DUPLICATES reports the near-duplicate pages
+    found by the current run and is replaced like the failures table.
+    ONLINE_RESOURCES_FAILURES, which reports the pages the current run could not scrape, is
+    always replaced, except when resuming an interrupted run, which keeps every table as it
+    is. The tables are independent, so their DDL is submitted asynchronously and runs
+    concurrently; column additions wait only for their own table. A single SHOW TABLES then
+    verifies every table, and the success or failure of each table's creation is logged.
 
     Args:
         session (Session): A Snowpark Session object connected to Snowflake.
+        incremental (bool, optional): Keep existing tables instead of replacing them. Defaults to False.
+        resume (bool, optional): Keep all existing tables, including the failures table, so an
+            interrupted run can continue. Defaults to False.
 
     Raises:
         Exception: If SQL commands fail due to permissions, connectivity, or syntax errors.
     """
     # Set the database and schema context for the session
-    session.sql("USE DATABASE SNOWFLAKE_DOCUMENTATION").collect()
-    session.sql("USE SCHEMA STAGING").collect()
+    use_staging_schema(session)
     logger.info("Set context to SNOWFLAKE_DOCUMENTATION.STAGING")
 
-    # Create or replace the ONLINE_RESOURCES table for navigation data
-    session.sql("""
-        CREATE OR REPLACE TABLE ONLINE_RESOURCES (
+    # Incremental runs keep the previous run's data so it can be diffed and merged, and resumed
+    # runs keep what the interrupted run already loaded
+    keep_existing = incremental or resume
+    create_clause = "CREATE TABLE IF NOT EXISTS" if keep_existing else "CREATE OR REPLACE TABLE"
+    # Run-scoped report tables are replaced unless an interrupted run is being resumed
+    report_clause = "CREATE TABLE IF NOT EXISTS" if resume else "CREATE OR REPLACE TABLE"
+    created = {}  # Table name -> its pending CREATE statement
+
+    # Create the ONLINE_RESOURCES table for navigation data
+    created["ONLINE_RESOURCES"] = submit_query(session, f"""
+        {create_clause} ONLINE_RESOURCES (
             ID VARCHAR,          -- Unique identifier for the navigation entry
             URL VARCHAR,         -- Fully-qualified URL of the page
             LABEL VARCHAR,       -- Display label for the navigation entry
             TYPE VARCHAR,        -- Type of navigation entry (e.g., page, section)
             DEPTH INTEGER,       -- Depth in the navigation hierarchy
             PARENT_URL VARCHAR,  -- URL of the parent navigation entry
-            SECTION VARCHAR      -- Section name (e.g., 'guides', 'developer')
+            SECTION VARCHAR,     -- Section name (e.g., 'guides', 'developer')
+            NAV_HASH VARCHAR     -- Hash of the navigation fields, used to detect changes
         )
-    """).collect()
-    # Verify that the table was created successfully
-    if session.sql("SHOW TABLES LIKE 'ONLINE_RESOURCES'").collect():
-        logger.info("Table ONLINE_RESOURCES created or replaced successfully.")
-    else:
-        logger.error("Table ONLINE_RESOURCES was not created!")
-
-    # Create or replace the ONLINE_RESOURCES_TXT table for text content
-    session.sql("""
-        CREATE OR REPLACE TABLE ONLINE_RESOURCES_TXT (
-            URL VARCHAR,         -- Fully-qualified URL of the page
-            CONTENT VARCHAR,     -- Scraped text content of the page
-            SECTION VARCHAR      -- Section name (e.g., 'guides', 'developer')
+    """)
+
+    # Create the ONLINE_RESOURCES_TXT table for text content
+    created["ONLINE_RESOURCES_TXT"] = submit_query(session, f"""
+        {create_clause} ONLINE_RESOURCES_TXT (
+            URL VARCHAR,            -- Fully-qualified URL of the page
+            CONTENT VARCHAR,        -- Scraped text content of the page
+            SECTION VARCHAR,        -- Section name (e.g., 'guides', 'developer')
+            CONTENT_HASH VARCHAR,   -- Hash of CONTENT, used to detect changes
+            FETCHED_AT TIMESTAMP_NTZ, -- When the content was last fetched (UTC)
+            DUPLICATE_OF VARCHAR,   -- Page holding the content of a collapsed duplicate (CONTENT is '')
+            CONTENT_FORMAT VARCHAR  -- Spider return_format of CONTENT, e.g. 'markdown'
         )
-    """).collect()
-    # Verify that the table was created successfully
-    if session.sql("SHOW TABLES LIKE 'ONLINE_RESOURCES_TXT'").collect():
-        logger.info("Table ONLINE_RESOURCES_TXT created or replaced successfully.")
-    else:
-        logger.error("Table ONLINE_RESOURCES_TXT was not created!")
+    """)
+
+    # Create the ONLINE_RESOURCES_CHUNKS table for retrieval-ready passages of the text content
+    created["ONLINE_RESOURCES_CHUNKS"] = submit_query(session, f"""
+        {create_clause} ONLINE_RESOURCES_CHUNKS (
+            URL VARCHAR,             -- Page the chunk was cut from
+            SECTION VARCHAR,         -- Section that scraped the page
+            CHUNK_INDEX INTEGER,     -- Position of the chunk within the page, from 0
+            HEADING VARCHAR,         -- Heading path of the chunk, e.g. 'Overview > Usage notes'
+            CONTENT VARCHAR,         -- Chunk text
+            TOKEN_ESTIMATE INTEGER,  -- Estimated number of model tokens in CONTENT
+            DEPTH INTEGER,           -- Depth of the page in the navigation hierarchy
+            PARENT_URL VARCHAR,      -- URL of the page's parent navigation entry
+            CONTENT_HASH VARCHAR     -- Hash of the page content the chunk was cut from
+        )
+    """)
+
+    # Create the ONLINE_RESOURCES_BOILERPLATE table holding each shared paragraph once
+    created["ONLINE_RESOURCES_BOILERPLATE"] = submit_query(session, f"""
+        {create_clause} ONLINE_RESOURCES_BOILERPLATE (
+            HASH VARCHAR,             -- Paragraph hash, referenced by markers in collapsed content
+            CONTENT VARCHAR,          -- The paragraph text
+            FIRST_URL VARCHAR,        -- Page on which the paragraph became boilerplate
+            SECTION VARCHAR,          -- Section of that page
+            DETECTED_AT TIMESTAMP_NTZ -- When the paragraph was first detected (UTC)
+        )
+    """)
+
+    # Create or replace the ONLINE_RESOURCES_DUPLICATES table reporting this run's near-duplicate
+    # pages; collapsed duplicates keep their pointer in ONLINE_RESOURCES_TXT.DUPLICATE_OF
+    created["ONLINE_RESOURCES_DUPLICATES"] = submit_query(session, f"""
+        {report_clause} ONLINE_RESOURCES_DUPLICATES (
+            URL VARCHAR,              -- Page found to duplicate another page
+            SECTION VARCHAR,          -- Section that scraped the page
+            DUPLICATE_OF VARCHAR,     -- Representative page of the duplicate cluster
+            SIMILARITY FLOAT,         -- Estimated Jaccard similarity to DUPLICATE_OF
+            DETECTED_AT TIMESTAMP_NTZ -- When the duplicate was detected (UTC)
+        )
+    """)
+
+    # Create the ONLINE_RESOURCES_SECTIONS table mapping URLs to the sections that link to them
+    created["ONLINE_RESOURCES_SECTIONS"] = submit_query(session, f"""
+        {create_clause} ONLINE_RESOURCES_SECTIONS (
+            URL VARCHAR,      -- Fully-qualified URL of the page
+            SECTION VARCHAR   -- Section whose navigation links to the page
+        )
+    """)
+
+    # Create or replace the ONLINE_RESOURCES_FAILURES table for pages that could not be scraped
+    created["ONLINE_RESOURCES_FAILURES"] = submit_query(session, f"""
+        {report_clause} ONLINE_RESOURCES_FAILURES (
+            URL VARCHAR,             -- Fully-qualified URL of the page
+            SECTION VARCHAR,         -- Section name (e.g., 'guides', 'developer')
+            ERROR VARCHAR,           -- Last error reported for the page
+            ATTEMPTS INTEGER,        -- Number of attempts made before giving up
+            FAILED_AT TIMESTAMP_NTZ  -- When the page was given up on (UTC)
+        )
+    """)
+
+    altered = []  # Pending column additions
+    if keep_existing:
+        # Tables created by older versions lack the change-tracking columns
+        created["ONLINE_RESOURCES"].result()
+        altered.append(submit_query(session, "ALTER TABLE ONLINE_RESOURCES ADD COLUMN IF NOT EXISTS NAV_HASH VARCHAR"))
+        created["ONLINE_RESOURCES_TXT"].result()
+        altered.append(submit_query(session, "ALTER TABLE ONLINE_RESOURCES_TXT ADD COLUMN IF NOT EXISTS CONTENT_HASH VARCHAR"))
+        altered.append(submit_query(session, "ALTER TABLE ONLINE_RESOURCES_TXT ADD COLUMN IF NOT EXISTS FETCHED_AT TIMESTAMP_NTZ"))
+        altered.append(submit_query(session, "ALTER TABLE ONLINE_RESOURCES_TXT ADD COLUMN IF NOT EXISTS DUPLICATE_OF VARCHAR"))
+        # Rows stored before the format was recorded hold plain text and read as NULL
+        altered.append(submit_query(session, "ALTER TABLE ONLINE_RESOURCES_TXT ADD COLUMN IF NOT EXISTS CONTENT_FORMAT VARCHAR"))
+    # Wait for every statement, raising the first failure
+    for pending in list(created.values()) + altered:
+        pending.result()
+
+    # Verify that every table was created successfully
+    existing = {row["name"] for row in run_query(session, "SHOW TABLES LIKE 'ONLINE_RESOURCES%'")}
+    for table_name in created:
+        if table_name in existing:
+            logger.info(f"Table {table_name} created or replaced successfully.")
+        else:
+            logger.error(f"Table {table_name} was not created!")
 
 def upload_navigation_data(session, tree_data, section_name):
     """
     Uploads navigation data to the ONLINE_RESOURCES table in Snowflake.
 
     This function takes a list of navigation entries (tree_data), adds the section name to each
-    entry, converts the data into a Snowpark DataFrame, and appends it to the ONLINE_RESOURCES table.
+    entry, and appends the rows to the ONLINE_RESOURCES table with a staged bulk load.
 
     Args:
         session (Session): A Snowpark Session object connected to Snowflake.
@@ -129,13 +357,12 @@ def upload_navigation_data(session, tree_data, section_name):
     """
     # Only proceed if there is data to upload
     if tree_data:
-        # Add the section name to each navigation entry
+        # Add the section name and change-tracking hash to each navigation entry
         for row in tree_data:
             row['section'] = section_name
-        # Convert the list of dictionaries to a Snowpark DataFrame
-        df = session.create_dataframe(tree_data)
-        # Append the DataFrame to the ONLINE_RESOURCES table
-        df.write.mode("append").save_as_table("ONLINE_RESOURCES")
+            row['nav_hash'] = nav_entry_hash(row)
+        # Stage the rows as compressed files and append them with COPY INTO
+        bulk_load(session, "ONLINE_RESOURCES", tree_data, NAV_COLUMNS)
         logger.info(f"Uploaded {len(tree_data)} rows to ONLINE_RESOURCES (section={section_name}).")
 
 def upload_text_data(session, txt_data, section_name):
@@ -143,7 +370,7 @@ def upload_text_data(session, txt_data, section_name):
     Uploads text content data to the ONLINE_RESOURCES_TXT table in Snowflake.
 
     This function takes a list of text content entries (txt_data), adds the section name to each
-    entry, converts the data into a Snowpark DataFrame, and appends it to the ONLINE_RESOURCES_TXT table.
+    entry, and appends the rows to the ONLINE_RESOURCES_TXT table with a staged bulk load.
 
     Args:
         session (Session): A Snowpark Session object connected to Snowflake.
@@ -155,11 +382,532 @@ def upload_text_data(session, txt_data, section_name):
     """
     # Only proceed if there is data to upload
     if txt_data:
-        # Add the section name to each text content entry
+        # Add the section name, content hash, fetch time and format to each text content entry
+        for row in txt_data:
+            row['section'] = section_name
+            if 'content_hash' not in row:  # Collapsed rows carry the hash of their original content
+                row['content_hash'] = content_hash(row['content'])
+            row.setdefault('fetched_at', utc_timestamp())
+            row.setdefault('content_format', TEXT_FORMAT)
+        # Stage the rows as compressed files and append them with COPY INTO
+        bulk_load(session, "ONLINE_RESOURCES_TXT", txt_data, TXT_COLUMNS)
+        logger.info(f"Uploaded {len(txt_data)} rows to ONLINE_RESOURCES_TXT (section={section_name}).")
+
+def upload_section_mapping(session, tree_data, section_name):
+    """
+    Replaces a section's rows in the ONLINE_RESOURCES_SECTIONS URL-to-section mapping.
+
+    Every URL in the section's navigation is recorded, including pages whose content was
+    scraped and stored by another section.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        tree_data (list): List of dictionaries containing navigation data.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the upload fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Never wipe a section's mapping because of an empty scrape
+    if not tree_data:
+        return
+    run_query(session, "DELETE FROM ONLINE_RESOURCES_SECTIONS WHERE SECTION = ?", params=[section_name])
+    rows = ({'url': url, 'section': section_name} for url in dict.fromkeys(row['url'] for row in tree_data))
+    loaded = bulk_load(session, "ONLINE_RESOURCES_SECTIONS", rows, SECTION_COLUMNS)
+    logger.info(f"Mapped {loaded} URLs to section={section_name} in ONLINE_RESOURCES_SECTIONS.")
+
+def upload_failure_data(session, failures, section_name):
+    """
+    Uploads pages that could not be scraped to the ONLINE_RESOURCES_FAILURES table.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        failures (list): Dictionaries with 'url', 'error' and 'attempts' keys.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the upload fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Only proceed if there is data to upload
+    if failures:
+        failed_at = utc_timestamp()
+        for row in failures:
+            row['section'] = section_name
+            row['failed_at'] = failed_at
+        bulk_load(session, "ONLINE_RESOURCES_FAILURES", failures, FAILURE_COLUMNS)
+        logger.info(f"Recorded {len(failures)} failed pages in ONLINE_RESOURCES_FAILURES (section={section_name}).")
+
+def load_into_temp_table(session, table_name, rows, columns):
+    """
+    Bulk loads rows into a new temporary table shaped like an existing table.
+
+    The temporary table gets a unique name so several loads can be merged independently.
+    It is dropped automatically when the session ends, but callers should drop it once the
+    data has been merged.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        table_name (str): The table whose structure the temporary table copies.
+        rows (list): Dictionaries keyed by lower-cased column names.
+        columns (list): (column_name, sql_type) tuples describing the columns to load.
+
+    Returns:
+        str: The name of the temporary table.
+    """
+    temp_table = f"{table_name}_MERGE_{uuid.uuid4().hex[:12].upper()}"
+    run_query(session, f"CREATE TEMPORARY TABLE {temp_table} LIKE {table_name}")
+    bulk_load(session, temp_table, rows, columns)
+    return temp_table
+
+def plan_incremental_scrape(session, tree_data, section_name, revalidate_days=INCREMENTAL_REVALIDATE_DAYS):
+    """
+    Selects the navigation entries whose pages need to be scraped in an incremental run.
+
+    A page is scraped when it is new to the section, when its navigation entry changed since
+    the last run, when no non-empty content is stored for it (by any section, as each page's
+    content is stored once), or when its content was last fetched more than revalidate_days
+    ago. A collapsed duplicate counts as stored only while the page its DUPLICATE_OF points
+    to still has content; a collapsed row whose pointer is missing or dangling is scraped
+    again. Content stored in another format than TEXT_FORMAT (plain text from before the
+    switch to markdown has a NULL format) is stale too, so the first incremental run after a
+    format change scrapes and re-chunks every such page once. Everything else is skipped.
+    This must run before merge_navigation_data, which overwrites the stored navigation hashes.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        tree_data (list): List of dictionaries containing navigation data.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+        revalidate_days (int, optional): Maximum age of stored content before it is fetched
+            again. Defaults to INCREMENTAL_REVALIDATE_DAYS.
+
+    Returns:
+        list: The navigation entries whose pages should be scraped.
+    """
+    # Fetch the stored navigation hash and whether each page still has fresh content
+    known = run_query(session, """
+        SELECT n.URL, n.NAV_HASH,
+               t.URL IS NOT NULL AND t.FETCHED_AT >= DATEADD(day, -?, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ)
+                   AND t.CONTENT_FORMAT IS NOT DISTINCT FROM ?
+                   AND (t.CONTENT <> '' OR d.CONTENT <> '') AS IS_FRESH
+        FROM ONLINE_RESOURCES n
+        LEFT JOIN ONLINE_RESOURCES_TXT t
+               ON t.URL = n.URL AND t.CONTENT_HASH <> ?
+        LEFT JOIN ONLINE_RESOURCES_TXT d
+               ON d.URL = t.DUPLICATE_OF
+        WHERE n.SECTION = ?
+    """, params=[revalidate_days, TEXT_FORMAT, content_hash(""), section_name])
+    fresh_hashes = {row['URL']: row['NAV_HASH'] for row in known if row['IS_FRESH']}
+    pending = [entry for entry in tree_data if fresh_hashes.get(entry['url']) != nav_entry_hash(entry)]
+    logger.info(
+        f"Incremental plan for section={section_name}: {len(pending)} of {len(tree_data)} pages to scrape."
+    )
+    return pending
+
+def merge_navigation_data(session, tree_data, section_name):
+    """
+    Merges a section's navigation data into ONLINE_RESOURCES and removes pages that left the nav.
+
+    New entries are inserted and entries whose navigation hash changed are updated. Entries for
+    the section that are no longer present in tree_data are deleted from ONLINE_RESOURCES, and
+    stored content and chunks are deleted once no section links to the page. Chunks pick up
+    the new depth and parent URL of entries that moved in the navigation. An empty tree_data is treated as a failed scrape and leaves the
+    stored data untouched.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        tree_data (list): List of dictionaries containing navigation data.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the merge fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Never treat an empty scrape as "every page was removed"
+    if not tree_data:
+        logger.warning(f"No navigation data for section={section_name}; skipping merge and deletes.")
+        return
+    # Add the section name and change-tracking hash to each navigation entry
+    for row in tree_data:
+        row['section'] = section_name
+        row['nav_hash'] = nav_entry_hash(row)
+    temp_table = load_into_temp_table(session, "ONLINE_RESOURCES", tree_data, NAV_COLUMNS)
+    try:
+        run_query(session, f"""
+            MERGE INTO ONLINE_RESOURCES t
+            USING {temp_table} s
+               ON t.URL = s.URL AND t.SECTION = s.SECTION
+            WHEN MATCHED AND t.NAV_HASH IS DISTINCT FROM s.NAV_HASH THEN UPDATE SET
+                ID = s.ID, LABEL = s.LABEL, TYPE = s.TYPE, DEPTH = s.DEPTH,
+                PARENT_URL = s.PARENT_URL, NAV_HASH = s.NAV_HASH
+            WHEN NOT MATCHED THEN INSERT (ID, URL, LABEL, TYPE, DEPTH, PARENT_URL, SECTION, NAV_HASH)
+                VALUES (s.ID, s.URL, s.LABEL, s.TYPE, s.DEPTH, s.PARENT_URL, s.SECTION, s.NAV_HASH)
+        """)
+        # Remove pages that are no longer linked from the section's navigation
+        run_query(session, f"""
+            DELETE FROM ONLINE_RESOURCES
+            WHERE SECTION = ? AND URL NOT IN (SELECT URL FROM {temp_table})
+        """, params=[section_name])
+        # Content is shared between sections, so only drop it once no section links to the page
+        for table_name in ("ONLINE_RESOURCES_TXT", "ONLINE_RESOURCES_CHUNKS"):
+            run_query(session, f"""
+                DELETE FROM {table_name}
+                WHERE URL NOT IN (SELECT URL FROM ONLINE_RESOURCES)
+            """)
+        # Keep the chunks' copy of the navigation hierarchy current without re-chunking
+        run_query(session, f"""
+            UPDATE ONLINE_RESOURCES_CHUNKS c
+            SET DEPTH = s.DEPTH, PARENT_URL = s.PARENT_URL
+            FROM {temp_table} s
+            WHERE c.URL = s.URL AND c.SECTION = s.SECTION
+              AND (c.DEPTH IS DISTINCT FROM s.DEPTH OR c.PARENT_URL IS DISTINCT FROM s.PARENT_URL)
+        """)
+    finally:
+        run_query(session, f"DROP TABLE IF EXISTS {temp_table}")
+    logger.info(f"Merged {len(tree_data)} rows into ONLINE_RESOURCES (section={section_name}).")
+
+def merge_text_data(session, txt_data, section_name):
+    """
+    Merges text content into ONLINE_RESOURCES_TXT, keyed on URL.
+
+    Each page's content is stored once, so the key is the URL alone and the section is that
+    of the section that scraped the page. New pages are inserted. For existing pages the fetch
+    time and section are always refreshed, while the content, its hash, format and the
+    DUPLICATE_OF pointer are rewritten together when the content hash or format changed, or
+    when the stored row is a collapsed duplicate that lost its pointer.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        txt_data (list): List of dictionaries containing text content data.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the merge fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Only proceed if there is data to merge
+    if txt_data:
+        # Add the section name, content hash, fetch time and format to each text content entry
         for row in txt_data:
             row['section'] = section_name
-        # Convert the list of dictionaries to a Snowpark DataFrame
-        df = session.create_dataframe(txt_data)
-        # Append the DataFrame to the ONLINE_RESOURCES_TXT table
-        df.write.mode("append").save_as_table("ONLINE_RESOURCES_TXT")
-        logger.info(f"Uploaded {len(txt_data)} rows to ONLINE_RESOURCES_TXT (section={section_name}).")
\ No newline at end of file
+            if 'content_hash' not in row:  # Collapsed rows carry the hash of their original content
+                row['content_hash'] = content_hash(row['content'])
+            row.setdefault('fetched_at', utc_timestamp())
+            row.setdefault('content_format', TEXT_FORMAT)
+        temp_table = load_into_temp_table(session, "ONLINE_RESOURCES_TXT", txt_data, TXT_COLUMNS)
+        try:
+            run_query(session, f"""
+                MERGE INTO ONLINE_RESOURCES_TXT t
+                USING {temp_table} s
+                   ON t.URL = s.URL
+                WHEN MATCHED AND (t.CONTENT_HASH IS DISTINCT FROM s.CONTENT_HASH
+                                  OR t.CONTENT_FORMAT IS DISTINCT FROM s.CONTENT_FORMAT
+                                  OR (t.CONTENT = '' AND t.DUPLICATE_OF IS NULL)) THEN UPDATE SET
+                    CONTENT = s.CONTENT, SECTION = s.SECTION, CONTENT_HASH = s.CONTENT_HASH,
+                    FETCHED_AT = s.FETCHED_AT, DUPLICATE_OF = s.DUPLICATE_OF, CONTENT_FORMAT = s.CONTENT_FORMAT
+                WHEN MATCHED THEN UPDATE SET SECTION = s.SECTION, FETCHED_AT = s.FETCHED_AT
+                WHEN NOT MATCHED THEN INSERT (URL, CONTENT, SECTION, CONTENT_HASH, FETCHED_AT, DUPLICATE_OF, CONTENT_FORMAT)
+                    VALUES (s.URL, s.CONTENT, s.SECTION, s.CONTENT_HASH, s.FETCHED_AT, s.DUPLICATE_OF, s.CONTENT_FORMAT)
+            """)
+        finally:
+            run_query(session, f"DROP TABLE IF EXISTS {temp_table}")
+        logger.info(f"Merged {len(txt_data)} rows into ONLINE_RESOURCES_TXT (section={section_name}).")
+
+def upload_chunk_data(session, chunk_rows, section_name):
+    """
+    Appends chunk rows to the ONLINE_RESOURCES_CHUNKS table with a staged bulk load.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        chunk_rows (list): Chunk rows as produced by chunk_pages.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the upload fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Only proceed if there is data to upload
+    if chunk_rows:
+        bulk_load(session, "ONLINE_RESOURCES_CHUNKS", chunk_rows, CHUNK_COLUMNS)
+        logger.info(f"Uploaded {len(chunk_rows)} rows to ONLINE_RESOURCES_CHUNKS (section={section_name}).")
+
+def replace_chunk_data(session, chunk_rows, section_name):
+    """
+    Replaces the stored chunks of every page in chunk_rows with the new chunks.
+
+    Used by incremental and resumed runs, where a page may already have chunks from an
+    earlier run: its old chunks are deleted and the new ones inserted.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        chunk_rows (list): Chunk rows as produced by chunk_pages.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the load fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Only proceed if there is data to load
+    if chunk_rows:
+        temp_table = load_into_temp_table(session, "ONLINE_RESOURCES_CHUNKS", chunk_rows, CHUNK_COLUMNS)
+        column_list = ", ".join(name for name, _ in CHUNK_COLUMNS)
+        try:
+            run_query(session, f"""
+                DELETE FROM ONLINE_RESOURCES_CHUNKS
+                WHERE URL IN (SELECT DISTINCT URL FROM {temp_table})
+            """)
+            run_query(session, f"""
+                INSERT INTO ONLINE_RESOURCES_CHUNKS ({column_list})
+                SELECT {column_list} FROM {temp_table}
+            """)
+        finally:
+            run_query(session, f"DROP TABLE IF EXISTS {temp_table}")
+        logger.info(f"Replaced chunks with {len(chunk_rows)} rows in ONLINE_RESOURCES_CHUNKS (section={section_name}).")
+
+def load_chunk_hashes(session):
+    """
+    Returns the content hash each page's stored chunks were cut from.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+
+    Returns:
+        dict: URL -> content hash, for every page that has chunks.
+    """
+    rows = run_query(session, """
+        SELECT URL, ANY_VALUE(CONTENT_HASH) AS CONTENT_HASH
+        FROM ONLINE_RESOURCES_CHUNKS
+        GROUP BY URL
+    """)
+    return {row['URL']: row['CONTENT_HASH'] for row in rows}
+
+def upload_duplicate_data(session, duplicates, section_name):
+    """
+    Appends near-duplicate findings to the ONLINE_RESOURCES_DUPLICATES table.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        duplicates (list): Dictionaries with 'url', 'section', 'duplicate_of', 'similarity'
+            and 'detected_at' keys.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the upload fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Only proceed if there is data to upload
+    if duplicates:
+        bulk_load(session, "ONLINE_RESOURCES_DUPLICATES", duplicates, DUPLICATE_COLUMNS)
+        logger.info(f"Recorded {len(duplicates)} near-duplicate pages in ONLINE_RESOURCES_DUPLICATES (section={section_name}).")
+
+def merge_boilerplate_data(session, boilerplate, section_name):
+    """
+    Adds newly detected boilerplate paragraphs to ONLINE_RESOURCES_BOILERPLATE.
+
+    Paragraphs already stored by an earlier run are left as they are, so each is stored once.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        boilerplate (list): Dictionaries with 'hash', 'content', 'first_url', 'section' and
+            'detected_at' keys.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+    Raises:
+        Exception: If the merge fails due to schema mismatches, permissions, or connectivity issues.
+    """
+    # Only proceed if there is data to merge
+    if boilerplate:
+        temp_table = load_into_temp_table(session, "ONLINE_RESOURCES_BOILERPLATE", boilerplate, BOILERPLATE_COLUMNS)
+        try:
+            run_query(session, f"""
+                MERGE INTO ONLINE_RESOURCES_BOILERPLATE t
+                USING {temp_table} s
+                   ON t.HASH = s.HASH
+                WHEN NOT MATCHED THEN INSERT (HASH, CONTENT, FIRST_URL, SECTION, DETECTED_AT)
+                    VALUES (s.HASH, s.CONTENT, s.FIRST_URL, s.SECTION, s.DETECTED_AT)
+            """)
+        finally:
+            run_query(session, f"DROP TABLE IF EXISTS {temp_table}")
+        logger.info(f"Stored {len(boilerplate)} boilerplate paragraphs in ONLINE_RESOURCES_BOILERPLATE (section={section_name}).")
+
+class ChunkUploader:
+    """
+    Chunks scraped pages in a process pool and uploads the chunks to ONLINE_RESOURCES_CHUNKS.
+
+    submit() hands a group of pages to the pool and returns immediately, so the pages are
+    chunked while the caller is busy uploading their text; upload() then waits for the
+    chunks and writes them. Pages with no content are skipped, as are pages whose content
+    hash matches the hash their stored chunks were cut from, so unchanged pages are never
+    chunked again. The uploader holds no session of its own, so it can be shared by upload
+    threads that each write with their own session.
+
+    Args:
+        executor (concurrent.futures.Executor): Pool that runs chunk_pages.
+        workers (int): Number of workers in the pool; each submit is split into this many tasks.
+        upload (callable, optional): Function used to write chunk rows, called as
+            upload(session, chunk_rows, section_name). Defaults to upload_chunk_data;
+            incremental and resumed runs pass replace_chunk_data.
+        known_hashes (dict, optional): URL -> content hash of the stored chunks. Defaults to None.
+        max_tokens (int, optional): Estimated tokens per chunk. Defaults to CHUNK_MAX_TOKENS.
+        overlap_tokens (int, optional): Estimated tokens repeated between chunks.
+            Defaults to CHUNK_OVERLAP_TOKENS.
+    """
+
+    def __init__(self, executor, workers, upload=upload_chunk_data, known_hashes=None,
+                 max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.upload_chunks = upload
+        self.known_hashes = known_hashes or {}
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def submit(self, rows, section_name):
+        """
+        Starts chunking the changed pages among rows.
+
+        Args:
+            rows (list): Scraped rows with 'url' and 'content' keys, and optionally 'depth'
+                and 'parent_url' from the navigation tree.
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+        Returns:
+            list: Futures resolving to lists of chunk rows, to be passed to upload().
+        """
+        pages = []
+        for row in rows:
+            if not row.get('content'):
+                continue
+            page_hash = content_hash(row['content'])
+            if self.known_hashes.get(row['url']) == page_hash:
+                metrics.incr("pages_chunk_skipped", section=section_name)
+                continue
+            pages.append({
+                'url': row['url'], 'content': row['content'], 'section': section_name,
+                'content_hash': page_hash, 'depth': row.get('depth'), 'parent_url': row.get('parent_url'),
+            })
+        # One task per worker keeps the pool busy without paying pickling overhead per page
+        task_size = max(1, -(-len(pages) // self.workers))
+        return [
+            self.executor.submit(chunk_pages, pages[i:i + task_size], self.max_tokens, self.overlap_tokens)
+            for i in range(0, len(pages), task_size)
+        ]
+
+    def upload(self, session, futures, section_name):
+        """
+        Waits for submitted chunking tasks and uploads their chunk rows.
+
+        Args:
+            session (Session): A Snowpark Session object connected to Snowflake.
+            futures (list): Futures returned by submit().
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+        Returns:
+            int: The number of chunk rows uploaded.
+        """
+        if not futures:
+            return 0
+        with metrics.stage("chunk_wait", section=section_name):
+            wait(futures)
+        chunk_rows = [row for future in futures for row in future.result()]
+        metrics.incr("chunks_created", len(chunk_rows), section=section_name)
+        metrics.incr("pages_chunked", len({row['url'] for row in chunk_rows}), section=section_name)
+        with metrics.stage("chunk_upload", section=section_name):
+            self.upload_chunks(session, chunk_rows, section_name)
+        return len(chunk_rows)
+
+class TextUploadSink:
+    """
+    Streams scraped text content into ONLINE_RESOURCES_TXT in bounded chunks.
+
+    Rows are buffered as they arrive and written with upload_text_data whenever the buffer
+    reaches max_rows rows or max_bytes bytes of content, so memory use stays flat regardless of
+    section size and everything flushed so far survives a later failure. When a checkpoint
+    journal is given, every flushed chunk is recorded in it so a resumed run skips those pages.
+    When a ChunkUploader is given, each flushed chunk's pages are also split into retrieval
+    chunks, in parallel with the text upload, before the flush is recorded as committed.
+    When a NearDuplicateDetector is given, each chunk is checked for near-duplicate pages and
+    boilerplate first; the findings are uploaded and, in collapse mode, the reduced content
+    is stored while chunks are still cut from the full content of non-duplicate pages.
+    When a LastmodIndex is given, the sitemap lastmod of every stored page is committed to it.
+
+    Args:
+        session (Session): A Snowpark Session object connected to Snowflake.
+        section_name (str): The name of the section (e.g., 'guides', 'developer').
+        upload (callable, optional): Function used to write a chunk, called as
+            upload(session, rows, section_name). Defaults to upload_text_data; incremental runs
+            pass merge_text_data.
+        max_rows (int, optional): Buffered rows that trigger a flush. Defaults to STREAM_FLUSH_ROWS.
+        max_bytes (int, optional): Buffered content bytes that trigger a flush. Defaults to STREAM_FLUSH_BYTES.
+        checkpoint (CheckpointJournal, optional): Journal that records committed chunks. Defaults to None.
+        chunker (ChunkUploader, optional): Splits uploaded pages into ONLINE_RESOURCES_CHUNKS.
+            Defaults to None.
+        deduper (NearDuplicateDetector, optional): Flags or collapses near-duplicate pages and
+            boilerplate. Defaults to None.
+        sitemap (LastmodIndex, optional): Sitemap index recording which pages were stored.
+            Defaults to None.
+    """
+
+    def __init__(self, session, section_name, upload=upload_text_data,
+                 max_rows=STREAM_FLUSH_ROWS, max_bytes=STREAM_FLUSH_BYTES, checkpoint=None, chunker=None,
+                 deduper=None, sitemap=None):
+        self.session = session
+        self.section_name = section_name
+        self.upload = upload
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.checkpoint = checkpoint
+        self.chunker = chunker
+        self.deduper = deduper
+        self.sitemap = sitemap
+        self.buffer = []  # Rows waiting to be uploaded
+        self.buffered_bytes = 0  # Approximate size of the buffered content
+        self.rows_uploaded = 0  # Total rows flushed to Snowflake by this sink
+
+    def add(self, rows):
+        """
+        Adds scraped rows to the buffer, flushing whenever a size or row limit is reached.
+
+        Args:
+            rows (list): Dictionaries with 'url' and 'content' keys.
+        """
+        for row in rows:
+            self.buffer.append(row)
+            self.buffered_bytes += len(row.get('content') or '')
+            if len(self.buffer) >= self.max_rows or self.buffered_bytes >= self.max_bytes:
+                self.flush()
+
+    def flush(self):
+        """
+        Uploads any buffered rows to ONLINE_RESOURCES_TXT and clears the buffer.
+        """
+        if not self.buffer:
+            return
+        stored_rows, duplicates = self.buffer, []
+        if self.deduper is not None:
+            with metrics.stage("dedupe", section=self.section_name):
+                stored_rows, duplicates, boilerplate = self.deduper.process(self.buffer, self.section_name)
+            # Store shared paragraphs before the pages that reference them
+            merge_boilerplate_data(self.session, boilerplate, self.section_name)
+        # Start chunking first so the pool works while the text is being uploaded
+        chunk_futures = None
+        if self.chunker is not None:
+            # Chunk full pages, skipping pages whose content is not stored (collapsed duplicates)
+            pages = [row for row, stored in zip(self.buffer, stored_rows) if stored.get('content')]
+            chunk_futures = self.chunker.submit(pages, self.section_name)
+        with metrics.stage("text_upload_chunk", section=self.section_name):
+            self.upload(self.session, stored_rows, self.section_name)
+        if chunk_futures is not None:
+            self.chunker.upload(self.session, chunk_futures, self.section_name)
+        upload_duplicate_data(self.session, duplicates, self.section_name)
+        if self.checkpoint is not None:
+            self.checkpoint.record_chunk(self.section_name, [row['url'] for row in self.buffer])
+        if self.sitemap is not None:
+            self.sitemap.commit([row['url'] for row in self.buffer])
+        self.rows_uploaded += len(self.buffer)
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def close(self):
+        """
+        Flushes the remaining rows. The sink should not be used afterwards.
+
+        Returns:
+            int: The total number of rows uploaded by this sink.
+        """
+        self.flush()
+        return self.rows_uploaded
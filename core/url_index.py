@@ -0,0 +1,122 @@
+import threading
+from collections import defaultdict
+from .config import logger
+from .metrics import metrics
+
+class UrlIndex:
+    """
+    Run-wide index of documentation URLs shared by every section of a crawl.
+
+    Many pages are linked from more than one section's navigation tree. The index records
+    every (URL, section) pair seen during the run, and lets exactly one section claim each URL
+    for scraping: the owner fetches the page's content and stores it, while the other
+    sections only record that they link to it. The owner is the section linking to the URL
+    that comes first in `section_order` (sections outside it come after, by name), so a page
+    is stored under the same section on every run as long as every section registers its
+    links before the first claim. All methods are thread-safe, so the index can be shared by
+    the pipeline's scrape workers.
+
+    Args:
+        section_order (list, optional): Section names in order of precedence. Defaults to ().
+    """
+
+    def __init__(self, section_order=()):
+        self.lock = threading.Lock()
+        self.ranks = {name: rank for rank, name in enumerate(section_order)}
+        self.owners = {}  # URL -> section that claimed it for scraping
+        self.sections = defaultdict(set)  # URL -> every section whose navigation links to it
+
+    def _rank(self, section_name):
+        """
+        Sort key giving a section's precedence when several sections link to a URL.
+        """
+        return (self.ranks.get(section_name, len(self.ranks)), section_name)
+
+    def register(self, tree_data, section_name):
+        """
+        Records the URLs a section's navigation links to, without claiming any of them.
+
+        Args:
+            tree_data (list): Navigation entries with a 'url' key.
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+        """
+        with self.lock:
+            for entry in tree_data:
+                self.sections[entry['url']].add(section_name)
+
+    def claim(self, url, section_name):
+        """
+        Claims a URL for a section, returning True only if the section owns it.
+
+        The first claim of a URL settles its owner: the linking section with the highest
+        precedence among those registered so far. A section claiming a URL it already owns
+        gets True again, so a section can safely re-check its own pages.
+
+        Args:
+            url (str): The page URL.
+            section_name (str): The section asking to scrape the page.
+
+        Returns:
+            bool: True if the section should scrape the URL.
+        """
+        with self.lock:
+            self.sections[url].add(section_name)
+            owner = self.owners.get(url)
+            if owner is None:
+                owner = self.owners[url] = min(self.sections[url], key=self._rank)
+        return owner == section_name
+
+    def restore(self, section_name, urls):
+        """
+        Re-registers URLs a section claimed in an earlier, interrupted run.
+
+        Restored owners take precedence over section order, so pages keep the section that
+        may already have stored them.
+
+        Args:
+            section_name (str): The section that claimed the URLs.
+            urls (list): The claimed URLs.
+        """
+        with self.lock:
+            for url in urls:
+                self.sections[url].add(section_name)
+                self.owners.setdefault(url, section_name)
+
+    def claim_entries(self, tree_data, section_name):
+        """
+        Records a section's navigation entries and returns the ones it should scrape.
+
+        Args:
+            tree_data (list): Navigation entries with a 'url' key.
+            section_name (str): The name of the section (e.g., 'guides', 'developer').
+
+        Returns:
+            list: The entries whose URLs were claimed by this section, in their original order.
+        """
+        claimed = [entry for entry in tree_data if self.claim(entry['url'], section_name)]
+        shared = len(tree_data) - len(claimed)
+        if shared:
+            metrics.incr("urls_shared", shared, section=section_name)
+            logger.info(
+                f"Skipping {shared} of {len(tree_data)} pages in section={section_name} "
+                f"that another section owns."
+            )
+        return claimed
+
+    def owner(self, url):
+        """
+        Returns the section that claimed a URL, or None if it was never claimed.
+        """
+        with self.lock:
+            return self.owners.get(url)
+
+    def sections_for(self, url):
+        """
+        Returns the sorted names of every section that links to a URL.
+        """
+        with self.lock:
+            return sorted(self.sections.get(url, ()))
+
+    def __len__(self):
+        with self.lock:
+            return len(self.sections)
@@ -1,13 +1,81 @@
+import argparse
 from core.config import API_KEY, logger
-from core.snowflake_utils import create_session, setup_snowflake_tables, upload_navigation_data, upload_text_data
-from core.scraper import  scrape_section, scrape_text_for_section
+from core.snowflake_utils import SessionPool, setup_snowflake_tables
+from core.pipeline import run_pipeline
+from core.cache import ScrapeCache, CachedSpider
+from core.checkpoint import CheckpointJournal
+from core.metrics import metrics
+from core.url_index import UrlIndex
+from core.dedupe import NearDuplicateDetector
+from core.sitemap import LastmodIndex
+from core.scheduler import ScheduledSpider
 from spider import Spider
 
 if __name__ == "__main__":
-    session = create_session()
-    setup_snowflake_tables(session)
+    parser = argparse.ArgumentParser(description="Scrape the Snowflake documentation into Snowflake tables.")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Keep existing tables, scrape only new or changed pages and apply changes with MERGE."
+    )
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="Serve repeated Spider requests from the local scrape cache and store new responses in it."
+    )
+    parser.add_argument(
+        "--replay", action="store_true",
+        help="Run entirely from the local scrape cache without sending any Spider requests."
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue the last interrupted run from its checkpoint journal instead of starting over."
+    )
+    parser.add_argument(
+        "--sitemap", action="store_true",
+        help="Also scrape pages whose sitemap lastmod changed, on top of the incremental plan; implies "
+             "--incremental."
+    )
+    parser.add_argument(
+        "--dedupe", choices=["flag", "collapse"],
+        help="Detect near-duplicate pages and boilerplate: 'flag' reports them in ONLINE_RESOURCES_DUPLICATES "
+             "and ONLINE_RESOURCES_BOILERPLATE and stores content unchanged, 'collapse' also stores duplicate "
+             "content and shared paragraphs once."
+    )
+    parser.add_argument("--duplicates-report", help="Write the near-duplicate clusters found by --dedupe as JSON.")
+    parser.add_argument("--metrics-json", help="Write a JSON run report with stage timings, counters and query IDs.")
+    parser.add_argument("--metrics-prom", help="Write run metrics as a Prometheus textfile.")
+    parser.add_argument("--trace", help="Record per-stage spans and write them as a Chrome trace file.")
+    args = parser.parse_args()
+    metrics.tracing = bool(args.trace)
+
+    # Journal progress so an interrupted run can be resumed; a resumed run keeps its original mode
+    checkpoint = CheckpointJournal(resume=args.resume, incremental=args.incremental or args.sitemap)
+    incremental = checkpoint.incremental
+
+    sitemap = None
+    if args.sitemap and not incremental:
+        logger.warning("Ignoring --sitemap: the run being resumed is a full run.")
+    elif args.sitemap:
+        sitemap = LastmodIndex()
+        if not sitemap.refresh():
+            # Keep the run going on the navigation trees alone
+            sitemap.close()
+            sitemap = None
+
+    with metrics.stage("setup"):
+        # Sessions are opened in parallel; each one loads a different section at the same time
+        session_pool = SessionPool()
+        session = session_pool.primary
+        setup_snowflake_tables(session, incremental=incremental, resume=checkpoint.resumed)
     
-    client = Spider(api_key=API_KEY)
+    cache = ScrapeCache() if args.cache or args.replay else None
+    scheduler = None
+    if args.replay:
+        # Offline replay: cache misses are treated as failed fetches
+        client = CachedSpider(None, cache, offline=True)
+    else:
+        # Rate-limit, budget and prioritise every request that actually reaches Spider
+        scheduler = ScheduledSpider(Spider(api_key=API_KEY))
+        client = CachedSpider(scheduler, cache) if cache is not None else scheduler
     
     sections = [
         {"url": "https://docs.snowflake.com/en/guides", "basename": "guides"},
@@ -16,21 +84,41 @@ if __name__ == "__main__":
         {"url": "https://docs.snowflake.com/en/release-notes/overview", "basename": "releases"},
     ]
     
-    for section in sections:
-        url = section["url"]
-        section_name = section["basename"]
-        logger.info(f"Processing section: {section_name} ({url})")
-        
-        try:
-            tree_data = scrape_section(client, url, section_name)
-            upload_navigation_data(session, tree_data, section_name)
-            
-            txt_data = scrape_text_for_section(client, tree_data)
-            upload_text_data(session, txt_data, section_name)
-            
-            logger.info(f"Completed processing {url} (section={section_name})")
-        except Exception as e:
-            logger.error(f"Error processing {url}: {str(e)}")
-    
-    session.close()
+    # Shared by all sections so a page linked from several sections is fetched and stored once,
+    # always by the first of them in this list
+    url_index = UrlIndex([section["basename"] for section in sections])
+    deduper = NearDuplicateDetector(collapse=args.dedupe == "collapse") if args.dedupe else None
+    try:
+        # Scrape and upload sections as an overlapping pipeline; failures are isolated per section
+        with metrics.stage("pipeline"):
+            failed = run_pipeline(
+                session, client, sections, incremental=incremental, url_index=url_index, checkpoint=checkpoint,
+                deduper=deduper, session_pool=session_pool, sitemap=sitemap, scheduler=scheduler
+            )
+        logger.info(f"Indexed {len(url_index)} unique URLs across {len(sections)} sections.")
+        if failed:
+            logger.warning(f"Sections {sorted(failed)} failed; run with --resume to retry them.")
+        else:
+            # Nothing is left to resume, so the journal's page bodies need not stay on disk
+            checkpoint.discard()
+        if deduper is not None:
+            deduper.log_summary()
+            if args.duplicates_report:
+                deduper.write_report(args.duplicates_report)
+    finally:
+        if scheduler is not None:
+            scheduler.log_stats()
+        session_pool.close()
+        checkpoint.close()
+        if sitemap is not None:
+            sitemap.close()
+        if cache is not None:
+            cache.close()
+        # Write reports even if the run was interrupted
+        if args.metrics_json:
+            metrics.write_json_report(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus_textfile(args.metrics_prom)
+        if args.trace:
+            metrics.write_trace(args.trace)
     logger.info("Scraping and uploading completed for all sections.")
\ No newline at end of file
@@ -0,0 +1,36 @@
+from core.chunking import chunk_text, split_sections
+
+PAGE = """# Connecting
+
+Open a session first.
+
+```python
+# create a session
+session = Session.builder.configs(params).create()
+
+# run a query
+session.sql("SELECT 1").collect()
+```
+
+Setting up
+----------
+
+~~~bash
+# install the connector
+pip install snowflake-snowpark-python
+~~~
+"""
+
+def test_comments_in_code_fences_are_not_headings():
+    headings = [heading for heading, _ in split_sections(PAGE)]
+
+    assert headings == ["Connecting", "Connecting > Setting up"]
+
+def test_code_fence_stays_in_one_chunk():
+    chunks = chunk_text(PAGE, max_tokens=200, overlap_tokens=0)
+
+    fenced = [chunk for chunk in chunks if "# create a session" in chunk['content']]
+    assert len(fenced) == 1
+    assert chunks[0]['heading'] == "Connecting"
+    assert fenced[0]['content'].count("```") == 2
+    assert "# run a query" in fenced[0]['content']
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from core.scheduler import CreditBudgetExceeded, ScheduledSpider
+
+class GatedSpider:
+    """
+    Client that holds each request until released and reports a fixed cost per page.
+    """
+
+    def __init__(self, cost):
+        self.cost = cost
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def scrape_url(self, url, params=None):
+        self.started.set()
+        self.release.wait(5)
+        return [{"url": u, "status": 200, "content": "x", "costs": {"total_cost": self.cost}} for u in url.split(',')]
+
+def test_budget_waits_for_in_flight_reservations_to_settle():
+    # The first request reserves 0.6 of the 1.0 budget but actually costs 0.1
+    client = GatedSpider(cost=0.1)
+    scheduler = ScheduledSpider(client, rate=1000, budget=1.0, cost_per_page=0.6, stats_interval=0)
+    first = threading.Thread(target=scheduler.scrape_url, args=("https://docs.example.com/a",))
+    first.start()
+    assert client.started.wait(5)
+    outcome = {}
+
+    def second():
+        try:
+            outcome['rows'] = scheduler.scrape_url("https://docs.example.com/b")
+        except CreditBudgetExceeded as error:
+            outcome['error'] = error
+
+    waiter = threading.Thread(target=second)
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()  # Waiting on the first request, not refused
+    client.release.set()
+    first.join(5)
+    waiter.join(5)
+
+    assert 'error' not in outcome
+    assert [row['url'] for row in outcome['rows']] == ["https://docs.example.com/b"]
+
+def test_budget_refuses_once_nothing_is_in_flight():
+    scheduler = ScheduledSpider(GatedSpider(cost=0.1), rate=1000, budget=0.5, cost_per_page=0.6, stats_interval=0)
+
+    with pytest.raises(CreditBudgetExceeded):
+        scheduler.scrape_url("https://docs.example.com/a")
@@ -0,0 +1,55 @@
+from core.retry import CircuitBreaker
+from core import scraper
+
+class PoisonSpider:
+    """
+    Client that rejects any batch containing the poison URL and serves every other page.
+    """
+
+    def __init__(self, poison):
+        self.poison = poison
+        self.requests = 0
+
+    def scrape_url(self, url, params=None):
+        self.requests += 1
+        urls = url.split(',')
+        if self.poison in urls:
+            raise Exception("Bad request")
+        return [{"url": u, "status": 200, "content": f"content of {u}", "error": None} for u in urls]
+
+def test_one_poison_url_costs_exactly_one_page(monkeypatch):
+    monkeypatch.setattr(scraper, "backoff_delay", lambda attempt, **kwargs: 0.0)
+    urls = [f"https://docs.example.com/page-{i}" for i in range(500)]
+    client = PoisonSpider(urls[137])
+    failures = []
+
+    rows = scraper.scrape_text_content(client, urls, {}, batch_size=500, max_retries=3, failures=failures)
+
+    assert sorted(row['url'] for row in rows) == sorted(urls[:137] + urls[138:])
+    assert [failure['url'] for failure in failures] == [urls[137]]
+    assert failures[0]['attempts'] == 3
+
+class DownSpider:
+    """
+    Client whose every request fails, as during an outage.
+    """
+
+    def __init__(self):
+        self.requests = 0
+
+    def scrape_url(self, url, params=None):
+        self.requests += 1
+        raise Exception("Connection reset by peer")
+
+def test_outage_gives_up_after_a_bounded_number_of_requests(monkeypatch):
+    monkeypatch.setattr(scraper, "backoff_delay", lambda attempt, **kwargs: 0.0)
+    monkeypatch.setattr(scraper, "CircuitBreaker", lambda: CircuitBreaker(cooldown=0.0))
+    urls = [f"https://docs.example.com/page-{i}" for i in range(500)]
+    client = DownSpider()
+    failures = []
+
+    rows = scraper.scrape_text_content(client, urls, {}, batch_size=500, max_retries=3, failures=failures)
+
+    assert rows == []
+    assert len(failures) == 500
+    assert client.requests <= 20